@@ -0,0 +1,191 @@
+import argparse
+import numpy as np
+import pandas as pd
+from utils import supabase, get_all_tickers, fetch_all_rows
+from memory_budget import parse_size, ChunkPlanner, StageTracker, iter_chunks, downcast_frame, format_size
+
+# BIAYA TRANSAKSI DEFAULT BURSA (Broker + Pungutan). Jual lebih mahal karena PPh final 0.1%.
+BUY_COST = 0.0015
+SELL_COST = 0.0025
+HORIZON = 20
+TRADING_DAYS = 252
+
+def load_prices(tickers, start_date, max_memory=None, tracker=None):
+    """
+    Menarik harga adjusted_close seluruh universe sejak start_date, per potongan ticker.
+    Setiap potongan langsung di-downcast (float32, ticker kategori) sebelum digabung.
+    Dengan max_memory, ukuran potongan disesuaikan otomatis dengan anggaran RAM.
+    """
+    planner = ChunkPlanner(parse_size(max_memory), initial=50, maximum=300)
+    tracker = tracker or StageTracker()
+    frames = []
+    done = 0
+    for chunk in iter_chunks(tickers, planner):
+        with tracker.stage("load_prices"):
+            rows = fetch_all_rows(lambda: supabase.table("daily_market_prices")
+                                  .select("ticker, trade_date, adjusted_close")
+                                  .in_("ticker", chunk)
+                                  .gte("trade_date", start_date)
+                                  .order("ticker").order("trade_date"))
+            if rows:
+                frame = pd.DataFrame(rows)
+                frame['adjusted_close'] = pd.to_numeric(frame['adjusted_close'], errors='coerce')
+                frames.append(downcast_frame(frame, categorical=()))
+            del rows
+        done += len(chunk)
+        print(f"   📥 Harga {done}/{len(tickers)} emiten dimuat (potongan {len(chunk)})...", end="\r")
+    print()
+
+    if not frames:
+        return pd.DataFrame(columns=["ticker", "trade_date", "adjusted_close"])
+    return downcast_frame(pd.concat(frames, ignore_index=True))
+
+def load_signals(start_date):
+    """
+    Menarik riwayat ml_predictions sebagai sinyal (ticker, date, grade).
+    """
+    rows = fetch_all_rows(lambda: supabase.table("ml_predictions")
+                          .select("ticker, prediction_date, predicted_grade")
+                          .gte("prediction_date", start_date)
+                          .order("prediction_date"))
+    df = pd.DataFrame(rows, columns=["ticker", "prediction_date", "predicted_grade"])
+    return df.rename(columns={"prediction_date": "date", "predicted_grade": "grade"})
+
+def build_panels(prices, signals, signal_grade='A'):
+    """
+    Mengubah data long menjadi panel (hari x ticker): matriks harga dan matriks sinyal boolean.
+    Sinyal tanggal d dieksekusi pada penutupan hari bursa PERTAMA setelah d (tanpa look-ahead).
+    """
+    prices = downcast_frame(prices.copy())
+    prices['adjusted_close'] = pd.to_numeric(prices['adjusted_close'], errors='coerce').astype(np.float32)
+
+    panel = prices.pivot_table(index='trade_date', columns='ticker', values='adjusted_close',
+                               aggfunc='last', observed=True)
+    panel = panel.sort_index()
+    # Saham suspensi: bawa harga terakhir ke depan (return 0), jangan isi mundur
+    panel = panel.ffill()
+
+    dates = panel.index.values
+    ticker_pos = pd.Index(panel.columns)
+    S = np.zeros(panel.shape, dtype=bool)
+
+    sig = signals[signals['grade'] == signal_grade]
+    if not sig.empty:
+        sig_dates = pd.to_datetime(sig['date']).values
+        rows = np.searchsorted(dates, sig_dates, side='right')
+        cols = ticker_pos.get_indexer(sig['ticker'])
+        ok = (rows < len(dates)) & (cols >= 0)
+        S[rows[ok], cols[ok]] = True
+
+    return panel, S
+
+def run_backtest(prices, signals, horizon=HORIZON, buy_cost=BUY_COST, sell_cost=SELL_COST, signal_grade='A'):
+    """
+    Simulasi strategi "Beli saat grade A, jual di T+horizon" secara vektor penuh atas panel hari x ticker.
+
+    Modal dibagi menjadi `horizon` sleeve: setiap hari satu sleeve membeli seluruh sinyal hari itu
+    dengan bobot sama dan menahannya `horizon` hari bursa. Sleeve tanpa sinyal menganggur (kas).
+    """
+    panel, S = build_panels(prices, signals, signal_grade)
+    # float32 cukup untuk harga & return harian, dan memangkas memori panel menjadi separuh
+    P = panel.to_numpy(dtype=np.float32)
+    D = len(P)
+
+    # Return harian per ticker; NaN (belum listing) dianggap 0 dan tidak bisa dibeli
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R = P[1:] / P[:-1] - np.float32(1.0)
+    R = np.vstack([np.zeros((1, P.shape[1]), dtype=np.float32), R])
+    R[~np.isfinite(R)] = 0.0
+
+    # Hanya sinyal yang punya harga masuk & keluar yang dihitung sebagai trade
+    S = S & np.isfinite(P)
+    S[max(D - horizon, 0):] = False
+
+    # 1. STATISTIK PER TRADE
+    exit_P = np.full_like(P, np.nan)
+    exit_P[:D - horizon] = P[horizon:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trade_ret = (1 - buy_cost) * (exit_P / P) * (1 - sell_cost) - 1.0
+    trades = trade_ret[S]
+    trades = trades[np.isfinite(trades)]
+
+    # 2. KURVA EKUITAS (horizon sleeve yang bergulir)
+    cohort_size = S.sum(axis=1)
+    port_ret = np.zeros(D)
+    for k in range(1, min(horizon, D - 1) + 1):
+        Sk = np.zeros_like(S)
+        Sk[k:] = S[:-k]
+        held = np.zeros(D)
+        held[k:] = cohort_size[:-k]
+        gross = (Sk * R).sum(axis=1)
+        port_ret += np.divide(gross, held, out=np.zeros(D), where=held > 0)
+    port_ret /= horizon
+
+    # Biaya: beli pada hari masuk, jual pada hari keluar, masing-masing sebesar porsi satu sleeve
+    port_ret -= (cohort_size > 0) * buy_cost / horizon
+    exit_cohort = np.zeros(D)
+    if D > horizon:
+        exit_cohort[horizon:] = cohort_size[:-horizon]
+    port_ret -= (exit_cohort > 0) * sell_cost / horizon
+
+    equity = np.cumprod(1.0 + port_ret)
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+
+    years = D / TRADING_DAYS if D else 0
+    daily_std = port_ret.std()
+    stats = {
+        "n_days": int(D),
+        "n_tickers": int(P.shape[1]),
+        "n_trades": int(len(trades)),
+        "hit_rate": round(float((trades > 0).mean() * 100), 2) if len(trades) else 0.0,
+        "avg_trade_return": round(float(trades.mean() * 100), 3) if len(trades) else 0.0,
+        "total_return": round(float((equity[-1] - 1) * 100), 2) if D else 0.0,
+        "cagr": round(float((equity[-1] ** (1 / years) - 1) * 100), 2) if years > 0 and equity[-1] > 0 else 0.0,
+        "max_drawdown": round(float(drawdown.min() * 100), 2) if D else 0.0,
+        "sharpe": round(float(port_ret.mean() / daily_std * np.sqrt(TRADING_DAYS)), 3) if daily_std > 0 else 0.0,
+        "exposure": round(float((cohort_size > 0).mean() * 100), 2) if D else 0.0,
+    }
+
+    curve = pd.DataFrame({"daily_return": port_ret, "equity": equity, "drawdown": drawdown}, index=panel.index)
+    return {"stats": stats, "equity_curve": curve}
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest walk-forward sinyal grade ML (Beli A, Jual T+20)")
+    parser.add_argument("--start", default="2020-01-01", help="Tanggal awal (YYYY-MM-DD)")
+    parser.add_argument("--horizon", type=int, default=HORIZON)
+    parser.add_argument("--buy-cost", type=float, default=BUY_COST)
+    parser.add_argument("--sell-cost", type=float, default=SELL_COST)
+    parser.add_argument("--signals", help="CSV sinyal alternatif (kolom: ticker,date,grade), mis. hasil re-prediksi walk-forward")
+    parser.add_argument("--output", help="Simpan kurva ekuitas ke CSV")
+    parser.add_argument("--max-memory", help="Anggaran RAM, mis. 1GB (potongan ticker adaptif)")
+    args = parser.parse_args()
+
+    print(f"📐 [BACKTEST] Strategi Beli A -> Jual T+{args.horizon} sejak {args.start}...")
+
+    if args.signals:
+        signals = pd.read_csv(args.signals)
+    else:
+        signals = load_signals(args.start)
+    print(f"📊 {len(signals)} sinyal dimuat.")
+
+    tracker = StageTracker()
+    tickers = sorted(signals['ticker'].unique()) if args.signals else get_all_tickers()
+    prices = load_prices(tickers, args.start, args.max_memory, tracker)
+    print(f"📈 {len(prices)} baris harga dimuat untuk {len(tickers)} emiten "
+          f"({format_size(prices.memory_usage(deep=True).sum())}).")
+
+    with tracker.stage("simulate"):
+        result = run_backtest(prices, signals, args.horizon, args.buy_cost, args.sell_cost)
+    for key, value in result["stats"].items():
+        print(f"   {key:>18}: {value}")
+
+    if args.output:
+        result["equity_curve"].to_csv(args.output)
+        print(f"💾 Kurva ekuitas disimpan ke {args.output}")
+
+    tracker.report()
+
+    print("\n🎉 BACKTEST SELESAI!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Modul yang di-import oleh uvicorn (main) dan oleh setiap cron job sebelum bekerja
+DEFAULT_MODULES = [
+    "utils",
+    "main",
+    "cli",
+    "model_store",
+    "seed_stocks",
+    "seed_historical",
+    "worker_market_yfinance",
+    "worker_feature_engineering",
+    "worker_fundamental",
+    "worker_ml_model",
+    "worker_price_alerts",
+    "worker_alert_stream",
+    "backtest",
+    "sector_aggregates",
+    "indicators",
+]
+
+def time_import(module, repeat=3):
+    """
+    Waktu import (detik) di interpreter baru, diambil nilai terbaik dari `repeat` percobaan.
+    Juga mengembalikan 5 import paling mahal dari `python -X importtime`.
+    """
+    best = None
+    slowest = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+            return None, last_line
+        if best is None or elapsed < best:
+            best = elapsed
+            slowest = _top_imports(proc.stderr, module)
+    return best, slowest
+
+def _top_imports(stderr, module, top=5):
+    rows = []
+    for line in stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not line.startswith("import time:"):
+            continue
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        # Hanya import langsung dari modul target agar sub-modul tidak dihitung dobel
+        if len(parts[2]) - len(parts[2].lstrip()) == 3 and name != module:
+            rows.append((cumulative, name))
+    rows.sort(reverse=True)
+    return [f"{name} {us / 1e6:.2f}s" for us, name in rows[:top]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu import (cold start) API & worker")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="Batas waktu import per modul (detik)")
+    args = parser.parse_args()
+
+    print(f"⏱️ [IMPORT BENCHMARK] Interpreter baru per modul, terbaik dari {args.repeat} percobaan (batas {args.budget:.2f}s)")
+    over_budget = []
+    for module in args.modules:
+        elapsed, detail = time_import(module, args.repeat)
+        if elapsed is None:
+            print(f"   ❌ {module:<28} gagal di-import: {detail}")
+            over_budget.append(module)
+            continue
+
+        status = "✅" if elapsed <= args.budget else "🐢"
+        print(f"   {status} {module:<28} {elapsed:6.3f}s   {', '.join(detail)}")
+        if elapsed > args.budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\n⚠️ {len(over_budget)} modul melewati batas: {', '.join(over_budget)}")
+        sys.exit(1)
+    print("\n🎉 Seluruh modul di bawah batas waktu import.")
+
+if __name__ == "__main__":
+    main()
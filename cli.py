@@ -0,0 +1,40 @@
+import argparse
+import runpy
+import sys
+
+# Satu pintu masuk untuk seluruh worker. Modul worker baru di-import SETELAH perintah dipilih,
+# sehingga `python cli.py --help` tidak membayar biaya import pandas/sklearn/yfinance sama sekali.
+COMMANDS = {
+    "seed-stocks": ("seed_stocks", "Sinkronisasi master emiten + sektor dari Invezgo"),
+    "historical": ("seed_historical", "Ingest harga historis 5 tahun (Yahoo Finance)"),
+    "market": ("worker_market_yfinance", "Ingest harga EOD harian (Yahoo Finance)"),
+    "features": ("worker_feature_engineering", "Rekayasa fitur teknikal + margin of safety"),
+    "fundamental": ("worker_fundamental", "Rekayasa fitur dengan retry jaringan (self-healing)"),
+    "train": ("worker_ml_model", "Training + prediksi harian, atau --evaluate"),
+    "backtest": ("backtest", "Backtest sinyal grade A (Beli A, Jual T+20)"),
+    "sectors": ("sector_aggregates", "Bangun ulang agregat sektor harian (--since / --dates)"),
+    "alerts": ("worker_price_alerts", "Pemindaian alert harga EOD (batch)"),
+    "alert-stream": ("worker_alert_stream", "Evaluator alert intraday berbasis stream tick"),
+    "write-cache": ("write_suppression", "Lihat / kosongkan cache hash penekan tulis (--clear)"),
+    "bench-imports": ("bench_imports", "Benchmark waktu import API & worker"),
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Weatso Kuantitatif - pintu masuk worker",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Perintah:\n" + "\n".join(f"  {name:<14} {desc}" for name, (_, desc) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Argumen diteruskan ke worker (mis. --max-memory 1GB)")
+    args = parser.parse_args(argv)
+
+    module, _ = COMMANDS[args.command]
+    # Jalankan worker persis seperti `python <worker>.py <args>`
+    sys.argv = [f"{module}.py"] + args.args
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Membuat modul di root repo bisa di-import oleh tests/ (pytest menambahkan direktori conftest ke sys.path)
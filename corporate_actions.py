@@ -0,0 +1,72 @@
+import numpy as np
+from utils import supabase, fetch_all_rows
+from rate_governor import get_governor, governed_call
+
+# Perubahan faktor penyesuaian di bawah 0.5% dianggap noise pembulatan, bukan split/dividen
+ADJ_TOLERANCE = 0.005
+CHUNK_SIZE = 1000
+HISTORY_COLUMNS = "ticker, trade_date, open_price, high_price, low_price, raw_close, adjusted_close, volume, is_manually_overridden"
+
+def fetch_stored_window(tickers, start_date):
+    """
+    Satu query untuk seluruh batch: baris tersimpan sejak start_date, dikelompokkan per ticker.
+    {ticker: {trade_date: row}}
+    """
+    res = supabase.table("daily_market_prices")\
+        .select("ticker, trade_date, adjusted_close, is_manually_overridden")\
+        .in_("ticker", tickers).gte("trade_date", start_date).execute()
+
+    stored = {}
+    for row in res.data or []:
+        stored.setdefault(row['ticker'], {})[row['trade_date']] = row
+    return stored
+
+def detect_adjustment_factor(stock_data, stored_rows):
+    """
+    Bandingkan Adj Close segar vs tersimpan pada hari-hari yang tumpang tindih (jendela 5 hari).
+    Yahoo menyesuaikan ulang SELURUH riwayat sebelum ex-date dengan faktor yang sama, sehingga
+    rasio pada hari tumpang tindih PALING AWAL adalah faktor untuk seluruh riwayat sebelum jendela.
+    Mengembalikan (faktor, tanggal_awal_jendela) atau (None, None) jika tidak ada perubahan.
+    """
+    if not stored_rows:
+        return None, None
+
+    dates = stock_data.index.strftime('%Y-%m-%d')
+    for date, fresh_adj in zip(dates, stock_data['Adj Close'].to_numpy(dtype=float)):
+        row = stored_rows.get(date)
+        if not row or row.get("is_manually_overridden") or not row.get("adjusted_close"):
+            continue
+        if not np.isfinite(fresh_adj) or fresh_adj <= 0:
+            continue
+
+        factor = fresh_adj / float(row['adjusted_close'])
+        if abs(factor - 1) > ADJ_TOLERANCE:
+            return float(factor), date
+        return None, None
+
+    return None, None
+
+def readjust_history(ticker, factor, before_date, suppressor=None):
+    """
+    Tulis ulang adjusted_close HANYA untuk riwayat ticker ini sebelum before_date (dikali faktor).
+    Baris yang dikunci admin (is_manually_overridden) tidak disentuh.
+    """
+    rows = fetch_all_rows(lambda: supabase.table("daily_market_prices").select(HISTORY_COLUMNS)
+                          .eq("ticker", ticker).lt("trade_date", before_date).order("trade_date"))
+
+    updates = []
+    for row in rows:
+        if row.pop("is_manually_overridden", False) or row.get("adjusted_close") is None:
+            continue
+        row['adjusted_close'] = float(row['adjusted_close']) * factor
+        updates.append(row)
+
+    supabase_governor = get_governor("supabase")
+    for c in range(0, len(updates), CHUNK_SIZE):
+        chunk = updates[c:c+CHUNK_SIZE]
+        governed_call(lambda: supabase.table("daily_market_prices")
+                      .upsert(chunk, on_conflict="ticker,trade_date").execute(), supabase_governor)
+        if suppressor:
+            suppressor.commit(chunk)
+
+    return len(updates)
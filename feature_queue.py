@@ -0,0 +1,21 @@
+from datetime import datetime
+from utils import supabase, fetch_all_rows
+
+# Antrian ticker yang technical_features-nya harus dihitung ulang (mis. setelah aksi korporasi)
+# Skema: supabase/migrations/20261019000002_feature_recompute_queue.sql
+QUEUE_TABLE = "feature_recompute_queue"
+
+def mark_dirty(ticker, reason):
+    supabase.table(QUEUE_TABLE).upsert({
+        "ticker": ticker,
+        "reason": reason,
+        "marked_at": datetime.now().isoformat(timespec='seconds')
+    }, on_conflict="ticker").execute()
+
+def get_dirty_tickers():
+    rows = fetch_all_rows(lambda: supabase.table(QUEUE_TABLE).select("ticker").order("ticker"))
+    return [r['ticker'] for r in rows]
+
+def clear_dirty(tickers):
+    if tickers:
+        supabase.table(QUEUE_TABLE).delete().in_("ticker", list(tickers)).execute()
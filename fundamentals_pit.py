@@ -0,0 +1,222 @@
+import os
+import math
+import requests
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from utils import supabase, fetch_all_rows
+from rate_governor import get_governor, governed_get
+
+load_dotenv()
+INVEZGO_KEY = os.getenv("INVEZGO_API_KEY")
+
+# Riwayat fundamental point-in-time: satu baris per (ticker, periode laporan)
+# Skema: supabase/migrations/20261019000003_fundamentals_pit.sql
+PIT_TABLE = "fundamentals_pit"
+# Jumlah kuartal yang ditarik sekali jalan (10 tahun)
+HISTORY_QUARTERS = 40
+# Riwayat di cache dianggap basi setelah N hari -> ditarik ulang untuk menangkap laporan kuartal terbaru
+REFRESH_DAYS = 30
+# Jeda publikasi laporan setelah akhir kuartal (batas OJK: interim ~1 bulan, semester ~2 bulan, tahunan ~3 bulan).
+# Angka fundamental baru "boleh diketahui" model sejak available_date, bukan sejak akhir periode.
+REPORT_LAG_DAYS = {1: 30, 2: 60, 3: 30, 4: 90}
+PIT_COLUMNS = "ticker, period_date, available_date, eps, bvps, graham_number, fetched_at"
+# Skema respons /analysis/keystat: rows[] = {name, values[]}, values[] = {date: akhir periode "YYYY-MM-DD", amount}
+KEYSTAT_PERIOD_FIELD = "date"
+
+# 1. PERTAHANAN SESI INVEZGO
+session = requests.Session()
+session.headers.update({"Authorization": f"Bearer {INVEZGO_KEY}"})
+# Retry adapter hanya untuk error koneksi. 429/5xx (termasuk Retry-After) ditangani governor (AIMD) agar laju
+# ikut turun: tanpa retry status di adapter, governor melihat setiap throttle dan retry tidak bertumpuk.
+retries = Retry(total=3, backoff_factor=1, status=0, respect_retry_after_header=False, raise_on_status=False)
+session.mount("https://", HTTPAdapter(max_retries=retries))
+invezgo_governor = get_governor("invezgo")
+
+def graham_number(eps, bvps):
+    if eps > 0 and bvps > 0:
+        return math.sqrt(22.5 * eps * bvps)
+    return 0.0
+
+def _period_end(value):
+    """Tanggal akhir periode dari satu entri 'values' keystat, None jika tidak ada / tidak terbaca."""
+    try:
+        return datetime.fromisoformat(str(value[KEYSTAT_PERIOD_FIELD])[:10]).date()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _available_date(period_end):
+    quarter = (period_end.month - 1) // 3 + 1
+    return period_end + timedelta(days=REPORT_LAG_DAYS[quarter])
+
+def fetch_history(ticker):
+    """
+    Menarik riwayat EPS/BVPS kuartalan dari Invezgo dan menyusunnya per periode.
+    Mengembalikan (history, tanpa_periode). tanpa_periode=True: ada angka EPS/BVPS tetapi tidak satu pun
+    bertanggal periode -> history kosong. Angka itu TIDAK dipakai sebagai "berlaku sejak hari ini", karena
+    MOS latih (seluruh riwayat 0) dan MOS inferensi (nilai riil) akan berbeda (skew latih/inferensi).
+    """
+    url = f"https://api.invezgo.com/analysis/keystat/{ticker}?type=Q&limit={HISTORY_QUARTERS}"
+    try:
+        res = governed_get(session, url, invezgo_governor, timeout=15)
+        if res.status_code != 200:
+            return [], False
+        data = res.json()
+    except Exception:
+        return [], False
+
+    if not data or not isinstance(data.get('rows'), list):
+        return [], False
+
+    periods = {}
+    has_values = False
+    for r in data['rows']:
+        name = r.get('name', '').upper()
+        if "EPS" in name or "EARNING PER SHARE" in name:
+            field = "eps"
+        elif "BVPS" in name or "BOOK VALUE PER SHARE" in name:
+            field = "bvps"
+        else:
+            continue
+
+        for v in r.get('values', []):
+            has_values = True
+            period_end = _period_end(v)
+            if period_end is not None:
+                periods.setdefault(period_end, {})[field] = float(v.get('amount', 0) or 0)
+
+    if not periods:
+        return [], has_values
+
+    fetched_at = datetime.now().isoformat(timespec='seconds')
+    history = []
+    for period_end, values in sorted(periods.items()):
+        eps = values.get("eps", 0.0)
+        bvps = values.get("bvps", 0.0)
+        history.append({
+            "ticker": ticker,
+            "period_date": period_end.isoformat(),
+            "available_date": _available_date(period_end).isoformat(),
+            "eps": eps,
+            "bvps": bvps,
+            "graham_number": graham_number(eps, bvps),
+            "fetched_at": fetched_at
+        })
+    return history, False
+
+class FundamentalsStore:
+    """
+    Cache riwayat fundamental point-in-time di tabel fundamentals_pit.
+    Seluruh cache ditarik SEKALI (satu query berpaginasi); Invezgo hanya dipanggil untuk ticker
+    yang belum punya riwayat atau riwayatnya lebih tua dari REFRESH_DAYS.
+    """
+
+    def __init__(self, refresh_days=REFRESH_DAYS):
+        self.refresh_days = refresh_days
+        self.fetched = 0
+        # Ticker yang riwayat Graham number-nya berubah pada run ini (laporan baru / revisi)
+        self.refreshed = set()
+        # Ticker tanpa riwayat point-in-time karena respons keystat tidak bertanggal periode:
+        # margin_of_safety-nya dikosongkan (NULL) dan tidak dipakai model, bukan diisi 0
+        self.fallback = set()
+        self._rows = {}
+        self._fetched_at = {}
+
+    def load(self, tickers=None):
+        def query():
+            q = supabase.table(PIT_TABLE).select(PIT_COLUMNS)
+            if tickers is not None:
+                q = q.in_("ticker", list(tickers))
+            return q.order("ticker").order("period_date")
+
+        for r in fetch_all_rows(query):
+            # Baris lama hasil fallback "angka terbaru berlaku hari ini" (period_date == available_date)
+            # bukan riwayat point-in-time: diabaikan agar ticker itu ditarik ulang
+            if str(r['period_date'])[:10] == str(r['available_date'])[:10]:
+                continue
+            self._rows.setdefault(r['ticker'], []).append(r)
+            self._fetched_at[r['ticker']] = max(self._fetched_at.get(r['ticker'], ""), r['fetched_at'] or "")
+        return self
+
+    def _is_stale(self, ticker):
+        fetched_at = self._fetched_at.get(ticker)
+        if not fetched_at:
+            return True
+        age = datetime.now() - datetime.fromisoformat(fetched_at[:19])
+        return age > timedelta(days=self.refresh_days)
+
+    def history(self, ticker):
+        if self._is_stale(ticker):
+            rows, no_periods = fetch_history(ticker)
+            self.fetched += 1
+            if no_periods and not self._rows.get(ticker):
+                self.fallback.add(ticker)
+            if rows:
+                try:
+                    supabase.table(PIT_TABLE).upsert(rows, on_conflict="ticker,period_date").execute()
+                except Exception as e:
+                    print(f"⚠️ Gagal simpan riwayat fundamental {ticker}: {e}", end=" ")
+                # GABUNG per period_date, jangan ganti: tarikan baru (mis. limit kuartal lebih pendek)
+                # tidak boleh menghapus riwayat point-in-time yang sudah terkumpul
+                merged = {str(r['period_date'])[:10]: r for r in self._rows.get(ticker, [])}
+                changed = False
+                for r in rows:
+                    old = merged.get(r['period_date'])
+                    if old is None or round(float(old['graham_number'] or 0), 6) != round(r['graham_number'], 6):
+                        changed = True
+                    merged[r['period_date']] = r
+                if changed:
+                    self.refreshed.add(ticker)
+                self._rows[ticker] = [merged[k] for k in sorted(merged)]
+                self._fetched_at[ticker] = rows[0]['fetched_at']
+        return self._rows.get(ticker, [])
+
+    def frame(self, tickers):
+        import pandas as pd
+
+        rows = [r for t in tickers for r in self.history(t)]
+        df = pd.DataFrame(rows, columns=["ticker", "available_date", "graham_number"])
+        df['available_date'] = pd.to_datetime(df['available_date'])
+        df['graham_number'] = pd.to_numeric(df['graham_number'], errors='coerce').fillna(0.0)
+        return df
+
+    def summary(self):
+        text = (f"[{PIT_TABLE}] {len(self._rows)} ticker di cache | {self.fetched} ditarik ulang dari Invezgo"
+                f" | {len(self.refreshed)} berubah")
+        if self.fallback:
+            text += (f"\n⚠️ {len(self.fallback)} ticker tanpa tanggal periode keystat (MOS dikosongkan): "
+                     f"{', '.join(sorted(self.fallback))}")
+        return text
+
+def margin_of_safety_asof(prices, funds, date_col="trade_date", price_col="adjusted_close"):
+    """
+    Margin of safety point-in-time untuk panel harga (satu atau banyak ticker sekaligus).
+    Setiap baris harga memakai Graham number dari laporan TERAKHIR yang sudah terbit pada tanggal itu
+    (merge_asof backward atas available_date), lalu MOS dihitung sebagai satu operasi array.
+    Baris sebelum laporan pertama terbit -> MOS 0 (sama seperti saham tanpa data fundamental).
+    Mengembalikan array MOS sejajar dengan urutan baris `prices`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if len(prices) == 0:
+        return np.zeros(0)
+
+    left = pd.DataFrame({
+        "_row": np.arange(len(prices)),
+        "ticker": prices['ticker'].to_numpy(),
+        "_date": pd.to_datetime(prices[date_col]).to_numpy(dtype="datetime64[ns]"),
+        "_price": pd.to_numeric(prices[price_col], errors='coerce').to_numpy(dtype='float64'),
+    }).astype({"ticker": str}).sort_values("_date", kind="stable")
+
+    right = funds.rename(columns={"available_date": "_date"})[["ticker", "_date", "graham_number"]]
+    right = right.astype({"ticker": str, "_date": "datetime64[ns]"}).sort_values("_date", kind="stable")
+
+    merged = pd.merge_asof(left, right, on="_date", by="ticker", direction="backward")
+    merged.sort_values("_row", inplace=True)
+
+    g = merged['graham_number'].fillna(0.0).to_numpy(dtype='float64')
+    p = merged['_price'].fillna(0.0).to_numpy(dtype='float64')
+    valid = (g > 0) & (p > 0)
+    return np.where(valid, (g - p) / np.where(valid, g, 1.0) * 100, 0.0)
@@ -0,0 +1,163 @@
+from datetime import datetime
+from utils import supabase, fetch_all_rows
+
+# Status per (ticker, kolom): versi indikator + tanggal terakhir yang sudah dihitung
+# Skema: supabase/migrations/20261019000005_feature_column_state.sql
+STATE_TABLE = "feature_column_state"
+# Kolom harga yang boleh dipakai sebagai input indikator
+PRICE_INPUTS = ("open_price", "high_price", "low_price", "adjusted_close", "volume")
+# Indikator rekursif (EMA / Wilder) baru konvergen setelah beberapa kali panjang pemanasannya:
+# hitungan inkremental memakai ekor riwayat sepanjang warmup x TAIL_FACTOR (minimal MIN_TAIL_ROWS baris)
+TAIL_FACTOR = 10
+MIN_TAIL_ROWS = 250
+# worker_market_yfinance menulis ulang jendela 5 hari bursa terakhir (harga bisa direvisi Yahoo):
+# hitungan inkremental selalu mengulang N tanggal terakhir yang sudah tersimpan, suppressor membuang yang tak berubah
+REVISION_ROWS = 5
+
+class Indicator:
+    """
+    Satu kolom technical_features.
+    - inputs: kolom harga (PRICE_INPUTS) dan/atau "fundamentals" (riwayat Graham number point-in-time)
+    - warmup: jumlah baris awal yang belum menghasilkan nilai
+    - version: naikkan jika rumus berubah -> kolom ini saja yang di-backfill ulang untuk seluruh riwayat
+    - model_feature: ikut menjadi fitur RandomForest di worker_ml_model
+    - nullable: NaN di luar pemanasan adalah nilai sah ("tidak ada data"), bukan tanda baris belum lengkap
+    """
+
+    def __init__(self, column, inputs, warmup, compute, version=1, model_feature=True, nullable=False):
+        self.column = column
+        self.inputs = tuple(inputs)
+        self.warmup = warmup
+        self.compute = compute
+        self.version = version
+        self.model_feature = model_feature
+        self.nullable = nullable
+
+    @property
+    def tail_rows(self):
+        return max(self.warmup * TAIL_FACTOR, MIN_TAIL_ROWS)
+
+    def __repr__(self):
+        return f"Indicator({self.column!r}, v{self.version}, warmup={self.warmup})"
+
+# Urutan pendaftaran = urutan kolom fitur model
+INDICATORS = {}
+
+def register(column, inputs, warmup, version=1, model_feature=True, nullable=False):
+    """
+    Dekorator pendaftaran indikator. Fungsi menerima (df, ctx) dan mengembalikan Series sejajar df.
+    Menambah indikator baru = satu fungsi di sini + kolom baru di tabel technical_features;
+    worker hanya mem-backfill kolom itu, kolom lain tidak dihitung ulang.
+    """
+    def decorator(fn):
+        if column in INDICATORS:
+            raise ValueError(f"Indikator {column} sudah terdaftar")
+        INDICATORS[column] = Indicator(column, inputs, warmup, fn, version, model_feature, nullable)
+        return fn
+    return decorator
+
+def feature_columns():
+    return list(INDICATORS)
+
+def model_features():
+    return [col for col, ind in INDICATORS.items() if ind.model_feature]
+
+def price_inputs(indicators):
+    return sorted({i for ind in indicators for i in ind.inputs if i in PRICE_INPUTS})
+
+def complete_rows(values):
+    """
+    Mask tanggal yang LENGKAP: seluruh fitur model non-nullable sudah bernilai (lewat pemanasan).
+    values: {kolom: Series} hasil compute. Hanya tanggal ini yang ditulis ke technical_features,
+    sama seperti dropna per baris sebelumnya: screener & loader ML tidak pernah melihat baris setengah kosong.
+    """
+    mask = None
+    for col, ind in INDICATORS.items():
+        if ind.model_feature and not ind.nullable:
+            mask = values[col].notna() if mask is None else mask & values[col].notna()
+    return mask
+
+def revisit_start(dates, last_date, rows=REVISION_ROWS):
+    """
+    Tanggal pertama yang dihitung ulang untuk kolom inkremental: `rows` tanggal terakhir s.d. last_date
+    (jendela revisi harga) ikut dihitung ulang, bukan hanya tanggal setelah last_date.
+    dates: Series trade_date (string ISO, urut naik).
+    """
+    stored = dates[dates <= last_date]
+    if stored.empty:
+        return last_date
+    return stored.iloc[-rows:].iloc[0]
+
+# =========================================================================
+# INDIKATOR BAWAAN (pandas_ta dimuat malas: berat karena numba)
+# =========================================================================
+@register("rsi_14", inputs=["adjusted_close"], warmup=14)
+def _rsi_14(df, ctx):
+    import pandas_ta as ta
+    return ta.rsi(df['adjusted_close'], length=14)
+
+@register("macd", inputs=["adjusted_close"], warmup=33)
+def _macd(df, ctx):
+    import pandas_ta as ta
+    return ta.macd(df['adjusted_close'], fast=12, slow=26, signal=9)['MACD_12_26_9']
+
+@register("margin_of_safety", inputs=["adjusted_close", "fundamentals"], warmup=0, nullable=True)
+def _margin_of_safety(df, ctx):
+    from fundamentals_pit import margin_of_safety_asof
+    import pandas as pd
+    # Fundamental tanpa tanggal periode: MOS dikosongkan (NULL), bukan 0 -> dibuang dari fitur latih ticker ini
+    if ctx.get('fundamentals_fallback'):
+        return pd.Series(float('nan'), index=df.index)
+    # MARGIN OF SAFETY POINT-IN-TIME: setiap tanggal memakai Graham number dari laporan yang sudah terbit saat itu
+    return pd.Series(margin_of_safety_asof(df, ctx['fundamentals']), index=df.index)
+
+@register("mfi_14", inputs=["high_price", "low_price", "adjusted_close", "volume"], warmup=14)
+def _mfi_14(df, ctx):
+    import pandas_ta as ta
+    # INJEKSI PILAR KE-3: Money Flow Index (MFI 14)
+    return ta.mfi(df['high_price'], df['low_price'], df['adjusted_close'], df['volume'], length=14)
+
+# =========================================================================
+# STATUS KOLOM & RENCANA BACKFILL
+# =========================================================================
+def load_column_state(tickers=None):
+    """Seluruh status kolom dalam satu tarikan berpaginasi: {ticker: {kolom: {"version", "last_date"}}}"""
+    def query():
+        q = supabase.table(STATE_TABLE).select("ticker, column_name, version, last_date")
+        if tickers is not None:
+            q = q.in_("ticker", list(tickers))
+        return q.order("ticker").order("column_name")
+
+    state = {}
+    for r in fetch_all_rows(query):
+        state.setdefault(r['ticker'], {})[r['column_name']] = {"version": r['version'], "last_date": r['last_date']}
+    return state
+
+def save_column_state(ticker, last_dates):
+    """last_dates: {kolom: tanggal terakhir yang bernilai} untuk kolom yang baru ditulis."""
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    rows = [{
+        "ticker": ticker,
+        "column_name": col,
+        "version": INDICATORS[col].version,
+        "last_date": last_date,
+        "updated_at": updated_at
+    } for col, last_date in last_dates.items()]
+    if rows:
+        supabase.table(STATE_TABLE).upsert(rows, on_conflict="ticker,column_name").execute()
+
+def plan_columns(ticker_state, force_full=(), rebuild=()):
+    """
+    Membagi indikator menjadi:
+    - full: belum pernah dihitung, versi berubah, atau dipaksa (aksi korporasi / --rebuild) -> seluruh riwayat
+    - incremental: {kolom: last_date} -> tanggal setelah last_date + jendela revisi (REVISION_ROWS) sebelumnya
+    """
+    full, incremental = [], {}
+    for col, ind in INDICATORS.items():
+        state = ticker_state.get(col)
+        if (col in rebuild or col in force_full or not state or not state['last_date']
+                or state['version'] != ind.version):
+            full.append(col)
+        else:
+            incremental[col] = str(state['last_date'])[:10]
+    return full, incremental
@@ -1,6 +1,11 @@
+import datetime
+from typing import Dict, List, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
 from utils import supabase 
+from model_store import ModelCache, predict_many
+from sector_aggregates import SectorCache
 
 app = FastAPI(title="Weatso Kuantitatif API", version="2.0")
 
@@ -12,6 +17,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cache model in-memory (LRU + batas memori), dimuat malas dari MODEL_STORE_DIR
+model_cache = ModelCache()
+MAX_PREDICT_ITEMS = 1000
+# Ringkasan sektor (tabel sector_daily_aggregates) di-cache per tanggal selama SECTOR_CACHE_TTL detik
+sector_cache = SectorCache()
+
+class PredictItem(BaseModel):
+    # Dipakai sebagai nama file model: hanya huruf/angka (tolak "../" dsb.)
+    ticker: str = Field(pattern=r"^[A-Za-z0-9]{1,12}$")
+    overrides: Dict[str, float] = Field(default_factory=dict)
+
+class PredictRequest(BaseModel):
+    items: List[PredictItem]
+
 @app.get("/")
 def read_root():
     return {"status": "Machine Learning API Server is Running", "version": "2.0"}
@@ -27,6 +46,19 @@ def get_all_stocks_screener():
         print(f"❌ API ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/sectors")
+def get_sector_summary(date: Optional[datetime.date] = None):
+    """
+    Ringkasan per sektor + breadth pasar ("market") untuk satu hari bursa (default: terbaru).
+    Dibaca dari agregat yang sudah dihitung worker, bukan dari scan seluruh screener.
+    `date` divalidasi sebagai tanggal ISO (422 jika bukan), jadi hanya tanggal sah yang menjadi kunci cache.
+    """
+    try:
+        return {**sector_cache.get(date.isoformat() if date else None), "cache": sector_cache.stats()}
+    except Exception as e:
+        print(f"❌ API ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/stocks/{ticker}")
 def get_stock_detail(ticker: str):
     ticker = ticker.upper()
@@ -59,4 +91,22 @@ def get_stock_detail(ticker: str):
         }
     except Exception as e:
         print(f"❌ API ERROR: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/predict")
+def predict_on_demand(req: PredictRequest):
+    """
+    Skoring on-demand banyak ticker sekaligus, dengan override fitur opsional (what-if).
+    Format hasil mengikuti tabel ml_predictions + prob_a.
+    """
+    if not req.items:
+        raise HTTPException(status_code=400, detail="items tidak boleh kosong")
+    if len(req.items) > MAX_PREDICT_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {MAX_PREDICT_ITEMS} item per request")
+
+    try:
+        results, errors = predict_many([item.model_dump() for item in req.items], model_cache)
+        return {"data": results, "errors": errors, "cache": model_cache.stats()}
+    except Exception as e:
+        print(f"❌ API ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
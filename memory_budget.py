@@ -0,0 +1,168 @@
+import os
+import re
+import resource
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024**2, "MB": 1024**2, "G": 1024**3, "GB": 1024**3}
+
+def parse_size(text):
+    """'1GB' / '512MB' / '2g' -> byte. None/'' -> None (tanpa batas)."""
+    if not text:
+        return None
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", str(text).upper())
+    if not match:
+        raise ValueError(f"Format ukuran memori tidak dikenal: {text}")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+def format_size(n_bytes):
+    return f"{n_bytes / 1024**2:,.0f} MB"
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+def peak_rss():
+    """High-water mark RSS. Di Linux dibaca dari VmHWM (bisa di-reset per tahap)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS melaporkan byte, Linux melaporkan KB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+_open_windows = []
+
+def _reset_peak_rss():
+    # Simpan puncak saat ini ke semua jendela yang masih terbuka sebelum kernel di-reset,
+    # agar tahap bersarang (stage di dalam chunk) tidak merusak pengukuran luar.
+    for window in _open_windows:
+        window.peak = max(window.peak, peak_rss())
+    # Linux >= 4.0: menulis "5" ke clear_refs me-reset VmHWM ke RSS saat ini
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+class PeakWindow:
+    """Puncak RSS yang terjadi di antara start() dan stop()."""
+
+    def __init__(self):
+        self.peak = 0
+        self.baseline = 0
+
+    def start(self):
+        _reset_peak_rss()
+        self.peak = 0
+        self.baseline = current_rss()
+        _open_windows.append(self)
+        return self
+
+    def stop(self):
+        if self in _open_windows:
+            _open_windows.remove(self)
+        self.peak = max(self.peak, peak_rss())
+        return self.peak
+
+class StageTracker:
+    """
+    Mencatat puncak RSS per tahap pipeline lalu mencetak laporan di akhir run.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        window = PeakWindow().start()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            peak = window.stop()
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak": 0})
+            entry["calls"] += 1
+            entry["seconds"] += time.monotonic() - started
+            entry["peak"] = max(entry["peak"], peak)
+
+    def report(self):
+        if not self.stages:
+            return
+        print("\n🧮 Laporan Memori per Tahap (Peak RSS):")
+        for name, entry in self.stages.items():
+            print(f"   {name:<18} peak {format_size(entry['peak']):>10} | {entry['calls']}x | {entry['seconds']:.1f}s")
+
+class ChunkPlanner:
+    """
+    Menentukan ukuran potongan ticker secara adaptif agar RSS tetap di bawah anggaran.
+    Setelah setiap potongan, biaya memori per ticker diukur (puncak - baseline) dan ukuran
+    potongan berikutnya disesuaikan dengan sisa ruang (target 70% anggaran).
+    Tanpa anggaran (None), ukuran potongan tetap = initial.
+    """
+
+    def __init__(self, budget_bytes, initial=10, minimum=1, maximum=200, target=0.7):
+        self.budget = budget_bytes
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self.bytes_per_item = None
+        self._window = PeakWindow()
+
+    def begin(self):
+        self._window.start()
+        return self.size
+
+    def end(self, n_items):
+        peak = self._window.stop()
+        if not self.budget or n_items <= 0:
+            return self.size
+
+        measured = max(peak - self._window.baseline, 1) / n_items
+        # Ambil nilai terbesar yang pernah terlihat agar tidak terlalu optimis
+        self.bytes_per_item = max(self.bytes_per_item or 0, measured)
+
+        headroom = self.budget * self.target - current_rss()
+        planned = int(headroom // self.bytes_per_item) if headroom > 0 else self.minimum
+        self.size = max(self.minimum, min(self.maximum, planned))
+        return self.size
+
+def iter_chunks(items, planner):
+    """Generator potongan adaptif: for chunk in iter_chunks(tickers, planner): ..."""
+    pos = 0
+    while pos < len(items):
+        size = planner.begin()
+        chunk = items[pos:pos+size]
+        yield chunk
+        pos += len(chunk)
+        planner.end(len(chunk))
+
+def downcast_frame(df, categorical=("ticker",), date_cols=("date", "trade_date", "calc_date", "prediction_date")):
+    """
+    Menghemat memori DataFrame: float64 -> float32, int64 -> int32 (jika muat),
+    ticker -> category, kolom tanggal string (object) -> datetime64.
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col in categorical:
+            df[col] = df[col].astype("category")
+        elif col in date_cols and not pd.api.types.is_datetime64_any_dtype(dtype):
+            df[col] = pd.to_datetime(df[col])
+        elif dtype == np.float64:
+            df[col] = df[col].astype(np.float32)
+        elif dtype == np.int64:
+            info = np.iinfo(np.int32)
+            if df[col].empty or (df[col].min() >= info.min and df[col].max() <= info.max):
+                df[col] = df[col].astype(np.int32)
+    return df
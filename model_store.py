@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# LOKASI PENYIMPANAN MODEL (Ditulis oleh train_and_predict, dibaca oleh API)
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "model_store")
+MODEL_CACHE_MAX_MB = float(os.getenv("MODEL_CACHE_MAX_MB", "512"))
+
+# Threshold ketat kelas A (Buy). Satu sumber kebenaran untuk worker & API.
+A_THRESHOLD = 0.65
+
+# Kode emiten BEI: huruf/angka saja. Dicek sebelum menyentuh filesystem agar input seperti "../x"
+# tidak bisa memuat (unpickle) file .joblib di luar MODEL_STORE_DIR.
+TICKER_PATTERN = re.compile(r"^[A-Z0-9]{1,12}$")
+
+def is_valid_ticker(ticker):
+    return isinstance(ticker, str) and bool(TICKER_PATTERN.match(ticker.upper()))
+
+def model_path(ticker):
+    if not is_valid_ticker(ticker):
+        raise ValueError(f"Ticker tidak valid: {ticker!r}")
+    return os.path.join(MODEL_STORE_DIR, f"{ticker.upper()}.joblib")
+
+def save_model(ticker, bundle):
+    """
+    Menyimpan bundle model (model, imputer, fitur, baris fitur terakhir) secara atomik.
+    File ditulis ke .tmp lalu di-rename agar API tidak pernah membaca file setengah jadi.
+    """
+    import joblib
+
+    os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+    path = model_path(ticker)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+def grade_from_proba(proba, classes, threshold=A_THRESHOLD):
+    """
+    Versi vektor dari aturan threshold: A hanya jika P(A) >= threshold,
+    selain itu dipaksa ke kelas terkuat berikutnya (B/C).
+    Mengembalikan (array grade, array P(A)). P(A) bernilai NaN jika model tidak mengenal kelas A.
+    """
+    proba = np.atleast_2d(np.asarray(proba, dtype=float))
+    classes = np.asarray(classes)
+
+    if 'A' not in classes:
+        return classes[np.argmax(proba, axis=1)], np.full(len(proba), np.nan)
+
+    idx_A = list(classes).index('A')
+    prob_A = proba[:, idx_A]
+    masked = proba.copy()
+    masked[:, idx_A] = -1
+    fallback = classes[np.argmax(masked, axis=1)]
+    return np.where(prob_A >= threshold, 'A', fallback), prob_A
+
+class ModelCache:
+    """
+    Cache LRU untuk bundle model dengan batas memori (MB).
+    Model dimuat malas (lazy) dari MODEL_STORE_DIR saat pertama diminta,
+    dan dimuat ulang otomatis jika file di disk lebih baru (hasil training malam).
+    """
+
+    def __init__(self, max_mb=MODEL_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # ticker -> (mtime, size_bytes, bundle)
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ticker):
+        ticker = ticker.upper()
+        path = model_path(ticker)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._evict(ticker)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry and entry[0] == stat.st_mtime:
+                self._entries.move_to_end(ticker)
+                self.hits += 1
+                return entry[2]
+
+        # Muat di luar lock agar request lain tidak tertahan oleh I/O disk
+        import joblib
+        bundle = joblib.load(path)
+        # Ukuran file pickle dipakai sebagai estimasi jejak memori model
+        size = stat.st_size
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(ticker, None)
+            if old:
+                self._used_bytes -= old[1]
+            self._entries[ticker] = (stat.st_mtime, size, bundle)
+            self._used_bytes += size
+            # Buang model yang paling lama tidak dipakai sampai kembali di bawah batas
+            while self._used_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._used_bytes -= old_size
+        return bundle
+
+    def _evict(self, ticker):
+        with self._lock:
+            old = self._entries.pop(ticker, None)
+            if old:
+                self._used_bytes -= old[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models_cached": len(self._entries),
+                "used_mb": round(self._used_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def predict_many(items, cache, threshold=A_THRESHOLD):
+    """
+    Skoring banyak baris sekaligus. items: list of {"ticker": str, "overrides": {fitur: nilai}}.
+    Baris dikelompokkan per ticker sehingga setiap model hanya dipanggil SATU kali predict_proba.
+    Mengembalikan (results, errors) dengan urutan results mengikuti urutan items; setiap hasil dan error
+    membawa "index" (posisi item di request) agar baris yang gagal bisa dikenali.
+    """
+    import pandas as pd
+
+    results = [None] * len(items)
+    errors = []
+
+    groups = OrderedDict()
+    for pos, item in enumerate(items):
+        ticker = item["ticker"]
+        if not is_valid_ticker(ticker):
+            errors.append({"index": pos, "ticker": ticker, "detail": "Ticker tidak valid"})
+            continue
+        groups.setdefault(ticker.upper(), []).append((pos, item.get("overrides") or {}))
+
+    for ticker, rows in groups.items():
+        bundle = cache.get(ticker)
+        if bundle is None:
+            errors.extend({"index": pos, "ticker": ticker, "detail": "Model belum tersedia"} for pos, _ in rows)
+            continue
+
+        features = bundle["features"]
+        valid_rows = []
+        for pos, overrides in rows:
+            bad_keys = sorted(k for k in overrides if k not in features)
+            if bad_keys:
+                errors.append({"index": pos, "ticker": ticker, "detail": f"Fitur override tidak dikenal: {bad_keys}"})
+            else:
+                valid_rows.append((pos, overrides))
+        if not valid_rows:
+            continue
+
+        matrix = np.empty((len(valid_rows), len(features)), dtype=float)
+        for r, (_, overrides) in enumerate(valid_rows):
+            for c, feat in enumerate(features):
+                value = overrides.get(feat, bundle["latest_row"].get(feat))
+                matrix[r, c] = np.nan if value is None else float(value)
+
+        model = bundle["model"]
+        # Jaga nama kolom agar konsisten dengan DataFrame saat fit
+        X = pd.DataFrame(bundle["imputer"].transform(pd.DataFrame(matrix, columns=features)), columns=features)
+        grades, prob_A = grade_from_proba(model.predict_proba(X), model.classes_, threshold)
+        feat_imp_dict = {feat: round(float(imp), 4) for feat, imp in zip(features, model.feature_importances_)}
+
+        for r, (pos, overrides) in enumerate(valid_rows):
+            results[pos] = {
+                "index": pos,
+                "ticker": ticker,
+                "prediction_date": bundle["prediction_date"],
+                "predicted_grade": str(grades[r]),
+                "prob_a": None if np.isnan(prob_A[r]) else round(float(prob_A[r]), 4),
+                "feature_importance": feat_imp_dict,
+                "feature_date": bundle["feature_date"],
+                "overrides": overrides,
+            }
+
+    errors.sort(key=lambda e: e["index"])
+    return [r for r in results if r is not None], errors
@@ -0,0 +1,179 @@
+import threading
+import time
+
+# Laju awal / minimum / maksimum (request per detik) per upstream.
+# "yahoo" dihitung per panggilan yf.download (satu batch ticker), bukan per ticker.
+ENDPOINT_LIMITS = {
+    "invezgo": {"rate": 4.0, "min_rate": 0.5, "max_rate": 20.0, "increase": 0.1},
+    "yahoo": {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0, "increase": 0.02},
+    "supabase": {"rate": 10.0, "min_rate": 1.0, "max_rate": 50.0, "increase": 0.5},
+}
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+# Jeda minimum sebelum percobaan ulang (eksponensial: 1s, 2s, 4s ...). Laju governor saja (1/rate ~0.1s)
+# terlalu singkat untuk memberi Cloudflare/Supabase waktu pulih dari 502.
+RETRY_BASE_DELAY = 1.0
+
+class RateGovernor:
+    """
+    Token bucket + AIMD per upstream.
+    - acquire(): tunggu sampai ada token (laju saat ini = `rate` request/detik).
+    - report(): sukses -> laju naik aditif (+increase); 429/5xx/error -> laju turun multiplikatif (x decrease),
+      plus jeda Retry-After jika server memintanya.
+    Hasilnya: worker berjalan secepat yang diizinkan upstream, bukan pada konstanta jeda paling pesimis.
+    """
+
+    def __init__(self, name, rate, min_rate, max_rate, increase, decrease=0.5, burst=1.0):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.throttles = 0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                wait = self._cooldown_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def report(self, status=None, error=False, retry_after=None):
+        throttled = error or status in THROTTLE_STATUSES
+        with self._lock:
+            if not throttled:
+                self.successes += 1
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                return
+
+            self.throttles += 1
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = 0
+            if retry_after:
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + float(retry_after))
+
+        print(f"\n   🐢 [{self.name}] {status or 'error'} -> laju turun {old_rate:.2f} -> {self.rate:.2f} req/s")
+
+    def summary(self):
+        return f"[{self.name}] laju akhir {self.rate:.2f} req/s | sukses {self.successes} | throttle {self.throttles}"
+
+_governors = {}
+_registry_lock = threading.Lock()
+
+def get_governor(name):
+    """Satu governor bersama per upstream untuk seluruh worker dalam proses yang sama."""
+    with _registry_lock:
+        if name not in _governors:
+            _governors[name] = RateGovernor(name, **ENDPOINT_LIMITS[name])
+        return _governors[name]
+
+def _retry_after(res):
+    value = res.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def _retry_delay(attempt):
+    return RETRY_BASE_DELAY * (2 ** attempt)
+
+def governed_get(session, url, governor, attempts=3, **kwargs):
+    """
+    session.get yang dipacu oleh governor. 429/5xx dicoba ulang (maksimal `attempts`) setelah
+    governor menurunkan laju dan jeda backoff eksponensial berlalu.
+    """
+    res = None
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(_retry_delay(attempt - 1))
+        governor.acquire()
+        try:
+            res = session.get(url, **kwargs)
+        except Exception:
+            governor.report(error=True)
+            if attempt == attempts - 1:
+                raise
+            continue
+
+        governor.report(res.status_code, retry_after=_retry_after(res))
+        if res.status_code not in THROTTLE_STATUSES:
+            break
+    return res
+
+def governed_download(symbols, governor, **kwargs):
+    """
+    yf.download untuk satu batch simbol, dipacu governor Yahoo (satu token per panggilan, bukan per ticker).
+    yfinance menelan error rate-limit dan mengembalikan frame kosong -> dilaporkan sebagai throttle.
+    """
+    import yfinance as yf
+
+    governor.acquire()
+    try:
+        data = yf.download(symbols, **kwargs)
+    except Exception:
+        governor.report(error=True)
+        raise
+    governor.report(error=data.empty)
+    return data
+
+def _exception_status(exc):
+    """Status HTTP dari exception klien (postgrest APIError.code, httpx/requests .response), jika ada."""
+    response = getattr(exc, "response", None)
+    for value in (getattr(response, "status_code", None), getattr(exc, "status_code", None), getattr(exc, "code", None)):
+        try:
+            status = int(value)
+        except (TypeError, ValueError):
+            continue
+        if 100 <= status <= 599:
+            return status
+    return None
+
+def is_transient(exc):
+    """
+    True untuk throttle/5xx dan error jaringan (layak dicoba ulang + menurunkan laju).
+    False untuk 4xx / error payload (mis. kolom salah, constraint): retry tidak akan menolong.
+    """
+    status = _exception_status(exc)
+    if status is not None:
+        return status in THROTTLE_STATUSES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # Error transport httpx/httpcore (dipakai supabase-py) tidak turun dari ConnectionError
+    return type(exc).__module__.split(".")[0] in ("httpx", "httpcore") and type(exc).__name__ != "HTTPStatusError"
+
+def governed_call(fn, governor, attempts=3):
+    """
+    Menjalankan fn() (mis. upsert Supabase) di bawah governor, dengan retry + backoff eksponensial
+    HANYA untuk error transient. Error payload (4xx) langsung dilempar tanpa menurunkan laju bersama.
+    """
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(_retry_delay(attempt - 1))
+        governor.acquire()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            governor.report(_exception_status(e), error=True)
+            if attempt == attempts - 1:
+                raise
+            continue
+        governor.report()
+        return result
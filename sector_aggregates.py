@@ -0,0 +1,216 @@
+import os
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from utils import supabase, fetch_all_rows
+
+# Ringkasan per (sektor, hari bursa). Sektor "ALL" = breadth seluruh pasar.
+# Skema: supabase/migrations/20261019000004_sector_daily_aggregates.sql
+AGG_TABLE = "sector_daily_aggregates"
+SECTOR_ALL = "ALL"
+AGG_COLUMNS = ["n_tickers", "grade_a", "grade_b", "grade_c", "median_rsi", "median_mfi", "median_mos",
+               "pct_above_target"]
+# Prediksi yang dibuat paling lambat N hari setelah tanggal fitur masih dihitung untuk hari itu (libur panjang)
+GRADE_LOOKAHEAD_DAYS = 7
+# Jumlah tanggal per query technical_features (~900 emiten per tanggal)
+DATES_PER_QUERY = 5
+SECTOR_CACHE_TTL = int(os.getenv("SECTOR_CACHE_TTL", "300"))
+# Jumlah tanggal yang ditahan cache sekaligus (LRU): kunci berasal dari query string klien
+SECTOR_CACHE_MAX_ENTRIES = int(os.getenv("SECTOR_CACHE_MAX_ENTRIES", "64"))
+
+def load_sector_map():
+    rows = fetch_all_rows(lambda: supabase.table("emitens").select("ticker, sector").eq("is_active", True).order("ticker"))
+    return {r['ticker']: r['sector'] or "Unknown" for r in rows}
+
+def compute_aggregates(features, grades, sector_map):
+    """
+    Agregat per (sektor, calc_date) dari baris technical_features + grade prediksi.
+    - grade: prediksi PERTAMA yang terbit pada/sesudah calc_date (merge_asof forward per ticker)
+    - pct_above_target: % emiten yang harganya di atas Graham number (margin_of_safety < 0),
+      hanya dari emiten yang punya Graham number (MOS != 0)
+    Sektor "ALL" dihitung dari seluruh baris pada tanggal yang sama.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if features.empty:
+        return pd.DataFrame(columns=["sector", "calc_date"] + AGG_COLUMNS)
+
+    df = features.copy()
+    df['calc_date'] = pd.to_datetime(df['calc_date'])
+    for col in ["rsi_14", "mfi_14", "margin_of_safety"]:
+        # Kolom indikator yang belum di-backfill pada rentang ini bisa absen seluruhnya
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+    df['sector'] = df['ticker'].map(sector_map).fillna("Unknown")
+
+    if not grades.empty:
+        g = grades.rename(columns={"prediction_date": "calc_date"})[["ticker", "calc_date", "predicted_grade"]].copy()
+        g['calc_date'] = pd.to_datetime(g['calc_date'])
+        df = pd.merge_asof(df.sort_values("calc_date"), g.sort_values("calc_date"), on="calc_date", by="ticker",
+                           direction="forward", tolerance=pd.Timedelta(days=GRADE_LOOKAHEAD_DAYS))
+    else:
+        df['predicted_grade'] = None
+
+    for grade in "ABC":
+        df[f"grade_{grade.lower()}"] = (df['predicted_grade'] == grade).astype('int32')
+    # MOS tepat 0 = placeholder "tidak ada Graham number" (lihat margin_of_safety_asof), bukan valuasi wajar:
+    # dikeluarkan dari median MOS maupun pct_above_target
+    df['margin_of_safety'] = df['margin_of_safety'].where(df['margin_of_safety'] != 0)
+    df['above_target'] = np.where(df['margin_of_safety'].notna(), (df['margin_of_safety'] < 0) * 100.0, np.nan)
+
+    both = pd.concat([df, df.assign(sector=SECTOR_ALL)], ignore_index=True)
+    agg = both.groupby(["sector", "calc_date"]).agg(
+        n_tickers=("ticker", "size"),
+        grade_a=("grade_a", "sum"),
+        grade_b=("grade_b", "sum"),
+        grade_c=("grade_c", "sum"),
+        median_rsi=("rsi_14", "median"),
+        median_mfi=("mfi_14", "median"),
+        median_mos=("margin_of_safety", "median"),
+        pct_above_target=("above_target", "mean"),
+    ).reset_index()
+    agg['calc_date'] = agg['calc_date'].dt.strftime('%Y-%m-%d')
+    return agg
+
+def _records(agg):
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    rows = []
+    for r in agg.to_dict('records'):
+        row = {"sector": r['sector'], "calc_date": r['calc_date'], "updated_at": updated_at}
+        for col in AGG_COLUMNS:
+            value = r[col]
+            if col in ("n_tickers", "grade_a", "grade_b", "grade_c"):
+                row[col] = int(value)
+            else:
+                # NaN (mis. seluruh MOS kosong) -> NULL
+                row[col] = None if value != value else round(float(value), 4)
+        rows.append(row)
+    return rows
+
+def refresh_aggregates(changed, sector_map=None, all_sectors=False):
+    """
+    Pembaruan INKREMENTAL dari pasangan (ticker, tanggal) yang baru ditulis.
+    Hanya tanggal yang tersentuh yang dihitung ulang, dan hanya baris sektor yang memuat ticker berubah
+    (+ "ALL") yang ditulis. Median tidak bisa digabung parsial, jadi satu tanggal = satu tarikan penuh
+    technical_features pada tanggal itu (~900 baris), bukan seluruh riwayat.
+    all_sectors=True: `changed` cukup berisi tanggal, seluruh sektor pada tanggal itu ditulis ulang.
+    """
+    import pandas as pd
+
+    touched = {}
+    if all_sectors:
+        touched = {str(date)[:10]: None for date in changed}
+    else:
+        for ticker, date in changed:
+            touched.setdefault(str(date)[:10], set()).add(ticker)
+    if not touched:
+        return 0
+
+    sector_map = sector_map or load_sector_map()
+    dates = sorted(touched)
+    written = 0
+    print(f"📊 [SECTOR AGGREGATES] Memperbarui agregat untuk {len(dates)} tanggal...")
+
+    for i in range(0, len(dates), DATES_PER_QUERY):
+        chunk = dates[i:i + DATES_PER_QUERY]
+        features = pd.DataFrame(fetch_all_rows(lambda: supabase.table("technical_features")
+            .select("ticker, calc_date, rsi_14, mfi_14, margin_of_safety")
+            .in_("calc_date", chunk).order("calc_date").order("ticker")))
+
+        last_day = (datetime.fromisoformat(chunk[-1]) + timedelta(days=GRADE_LOOKAHEAD_DAYS)).strftime('%Y-%m-%d')
+        grades = pd.DataFrame(fetch_all_rows(lambda: supabase.table("ml_predictions")
+            .select("ticker, prediction_date, predicted_grade")
+            .gte("prediction_date", chunk[0]).lte("prediction_date", last_day)
+            .order("prediction_date").order("ticker")))
+
+        agg = compute_aggregates(features, grades, sector_map)
+        if agg.empty:
+            continue
+
+        # Hanya sel (sektor, tanggal) yang memuat ticker berubah yang dikirim ulang
+        if not all_sectors:
+            wanted = {(sector_map.get(t) or "Unknown", d) for d in chunk for t in touched[d]}
+            wanted |= {(SECTOR_ALL, d) for d in chunk}
+            agg = agg[[(s, d) in wanted for s, d in zip(agg['sector'], agg['calc_date'])]]
+        rows = _records(agg)
+        if rows:
+            supabase.table(AGG_TABLE).upsert(rows, on_conflict="sector,calc_date").execute()
+            written += len(rows)
+
+    print(f"✅ {written} baris agregat sektor diperbarui.")
+    return written
+
+class SectorCache:
+    """
+    Cache in-process untuk GET /api/sectors. Tabel agregat hanya berubah saat worker harian jalan,
+    jadi hasil query disimpan selama `ttl` detik per tanggal, maksimal `max_entries` tanggal (LRU).
+    calc_date wajib ISO (YYYY-MM-DD): string lain ditolak dengan ValueError, bukan dijadikan kunci cache.
+    """
+
+    def __init__(self, ttl=SECTOR_CACHE_TTL, max_entries=SECTOR_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, calc_date=None):
+        if calc_date is not None:
+            calc_date = datetime.strptime(str(calc_date), '%Y-%m-%d').strftime('%Y-%m-%d')
+        key = calc_date or "latest"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if calc_date is None:
+            res = supabase.table(AGG_TABLE).select("calc_date").order("calc_date", desc=True).limit(1).execute()
+            if not res.data:
+                return {"calc_date": None, "market": None, "sectors": []}
+            calc_date = res.data[0]['calc_date']
+
+        res = supabase.table(AGG_TABLE).select("*").eq("calc_date", calc_date).order("sector").execute()
+        rows = res.data or []
+        value = {
+            "calc_date": calc_date,
+            "market": next((r for r in rows if r['sector'] == SECTOR_ALL), None),
+            "sectors": [r for r in rows if r['sector'] != SECTOR_ALL]
+        }
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "ttl": self.ttl}
+
+def rebuild(since):
+    """Bangun ulang seluruh agregat sejak tanggal tertentu (sekali jalan / setelah perubahan definisi)."""
+    import pandas as pd
+
+    # Hari libur bursa menghasilkan tarikan kosong dan dilewati
+    dates = pd.bdate_range(since, datetime.now()).strftime('%Y-%m-%d')
+    refresh_aggregates(dates, all_sectors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregat harian per sektor + breadth pasar")
+    parser.add_argument("--dates", nargs="+", help="Hitung ulang tanggal tertentu (YYYY-MM-DD) untuk semua sektor")
+    parser.add_argument("--since", help="Bangun ulang seluruh agregat sejak tanggal ini (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.since:
+        rebuild(args.since)
+    elif args.dates:
+        refresh_aggregates(args.dates, all_sectors=True)
+    else:
+        parser.print_help()
@@ -1,84 +1,135 @@
-import time
-import yfinance as yf
+import argparse
 import pandas as pd
 from utils import supabase, get_all_tickers
+from rate_governor import get_governor, governed_call, governed_download
+from write_suppression import WriteSuppressor
+from memory_budget import parse_size, ChunkPlanner, StageTracker, iter_chunks, format_size
 
-def ingest_historical_data():
+# PERTAHANAN DATABASE: Chunking
+# Supabase akan "Stream Reset" jika kita melempar 7.500 baris sekaligus.
+# Kita potong muatan menjadi potongan-potongan kecil berisi 1000 baris.
+CHUNK_SIZE = 1000
+PRICE_COLUMNS = ["open_price", "high_price", "low_price", "raw_close", "adjusted_close", "volume"]
+
+def ticker_frame(data, symbol):
+    """
+    Ambil OHLCV satu simbol dari hasil yf.download(group_by='ticker').
+    yfinance 0.2.x mengembalikan kolom MultiIndex bahkan untuk SATU ticker, jadi jangan bergantung
+    pada jumlah ticker di batch (ChunkPlanner bisa turun ke batch berisi 1 ticker).
+    Mengembalikan None jika simbol tidak ada di hasil unduhan.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return None
+        data = data[symbol]
+    return data.dropna(subset=['Close'])
+
+def frame_to_rows(ticker, stock_data):
+    """
+    Mengubah DataFrame OHLCV satu saham menjadi list payload secara vektor (tanpa iterrows).
+    """
+    frame = pd.DataFrame({
+        "trade_date": stock_data.index.strftime('%Y-%m-%d'),
+        "open_price": stock_data['Open'].astype(float).to_numpy(),
+        "high_price": stock_data['High'].astype(float).to_numpy(),
+        "low_price": stock_data['Low'].astype(float).to_numpy(),
+        "raw_close": stock_data['Close'].astype(float).to_numpy(),
+        "adjusted_close": stock_data['Adj Close'].astype(float).to_numpy(),
+        "volume": stock_data['Volume'].fillna(0).astype('int64').to_numpy()
+    })
+    frame.insert(0, "ticker", ticker)
+    return frame.to_dict('records')
+
+def ingest_historical_data(max_memory=None, suppress=True, prime=False):
     tickers = get_all_tickers()
     total = len(tickers)
-    print(f"🕰️ [HISTORICAL INGESTOR] Memulai ekstraksi data 3 TAHUN untuk {total} emiten...")
-
-    # Turunkan batch ke 10. Jika kita menarik 3 tahun data untuk 10 saham,
-    # itu berarti kita memproses sekitar 7.500 baris data per siklus loop.
-    BATCH_SIZE = 10 
-    
-    for i in range(0, total, BATCH_SIZE):
-        batch_tickers = tickers[i:i+BATCH_SIZE]
+    print(f"🕰️ [HISTORICAL INGESTOR] Memulai ekstraksi data 5 TAHUN untuk {total} emiten...")
+
+    # Default batch 10: 5 tahun data untuk 10 saham ~ 12.500 baris per siklus loop.
+    # Dengan --max-memory, ukuran batch disesuaikan otomatis dengan anggaran RAM.
+    budget = parse_size(max_memory)
+    planner = ChunkPlanner(budget, initial=10, maximum=25)
+    tracker = StageTracker()
+    yahoo_governor = get_governor("yahoo")
+    supabase_governor = get_governor("supabase")
+    # Harga 5 tahun ke belakang hampir selalu identik dengan yang sudah tersimpan: kirim yang berubah saja
+    suppressor = WriteSuppressor("daily_market_prices", "trade_date", PRICE_COLUMNS, enabled=suppress)
+    if budget:
+        print(f"🧮 Anggaran memori: {format_size(budget)} (batch adaptif)")
+
+    done = 0
+    for batch_tickers in iter_chunks(tickers, planner):
         yf_symbols = [f"{t}.JK" for t in batch_tickers]
-        
-        print(f"🔄 Memproses Batch {i+1}-{min(i+BATCH_SIZE, total)}...", end=" ")
-        
+
+        print(f"🔄 Memproses Batch {done+1}-{done+len(batch_tickers)}...", end=" ")
+        done += len(batch_tickers)
+
         try:
-            # PERUBAHAN KRITIS: period="3y"
-            data = yf.download(
-                yf_symbols, 
-                period="5y", 
-                group_by='ticker', 
-                progress=False, 
-                threads=False, 
-                auto_adjust=False 
-            )
-            
+            # Yahoo Finance sangat kejam terhadap penarikan massal bertahun-tahun: laju diatur governor (AIMD)
+            with tracker.stage("download"):
+                data = governed_download(
+                    yf_symbols,
+                    yahoo_governor,
+                    period="5y",
+                    group_by='ticker',
+                    progress=False,
+                    threads=False,
+                    auto_adjust=False
+                )
+
+            # Payload dikirim per CHUNK_SIZE begitu terkumpul, tidak ditahan sampai satu batch penuh
             updates = []
+            sent = 0
             for ticker in batch_tickers:
                 symbol = f"{ticker}.JK"
                 try:
-                    if len(batch_tickers) > 1:
-                        if symbol not in data.columns.levels[0]: continue
-                        stock_data = data[symbol].dropna(subset=['Close'])
-                    else:
-                        stock_data = data.dropna(subset=['Close'])
-                        
-                    if stock_data.empty: continue
-                    
-                    # ITERASI HISTORIS: Kita bongkar seluruh baris tanggal untuk saham ini
-                    for date_idx, row in stock_data.iterrows():
-                        trade_date = date_idx.strftime('%Y-%m-%d')
-                        
-                        updates.append({
-                            "ticker": ticker,
-                            "trade_date": trade_date,
-                            "open_price": float(row['Open']),
-                            "high_price": float(row['High']),
-                            "low_price": float(row['Low']),
-                            "raw_close": float(row['Close']),
-                            "adjusted_close": float(row['Adj Close']), 
-                            "volume": int(row['Volume']) if pd.notna(row['Volume']) else 0
-                        })
+                    with tracker.stage("transform"):
+                        stock_data = ticker_frame(data, symbol)
+                        if stock_data is None or stock_data.empty: continue
+
+                        if prime:
+                            suppressor.prime(ticker)
+                        updates.extend(suppressor.filter(frame_to_rows(ticker, stock_data)))
                 except Exception as e:
-                    continue # Abaikan jika data berantakan (biasanya saham baru IPO)
+                    # Abaikan jika data berantakan (biasanya saham baru IPO), tapi jangan diam-diam
+                    print(f"\n   ⚠️ {ticker} dilewati: {e}", end=" ")
+                    continue
+
+                with tracker.stage("upsert"):
+                    while len(updates) >= CHUNK_SIZE:
+                        chunk, updates = updates[:CHUNK_SIZE], updates[CHUNK_SIZE:]
+                        # Kita tidak peduli dengan override admin di sini karena ini data masa lalu
+                        governed_call(lambda: supabase.table("daily_market_prices")
+                                      .upsert(chunk, on_conflict="ticker,trade_date").execute(), supabase_governor)
+                        suppressor.commit(chunk)
+                        sent += len(chunk)
+
+            del data
 
-            # PERTAHANAN DATABASE: Chunking
-            # Supabase akan "Stream Reset" jika kita melempar 7.500 baris sekaligus.
-            # Kita potong muatan menjadi potongan-potongan kecil berisi 1000 baris.
             if updates:
-                CHUNK_SIZE = 1000
-                for c in range(0, len(updates), CHUNK_SIZE):
-                    chunk = updates[c:c+CHUNK_SIZE]
-                    # Kita tidak peduli dengan override admin di sini karena ini data masa lalu
-                    supabase.table("daily_market_prices").upsert(chunk, on_conflict="ticker,trade_date").execute()
-                    
-                print(f"✅ {len(updates)} baris historis disuntikkan.")
+                with tracker.stage("upsert"):
+                    governed_call(lambda: supabase.table("daily_market_prices")
+                                  .upsert(updates, on_conflict="ticker,trade_date").execute(), supabase_governor)
+                    suppressor.commit(updates)
+                    sent += len(updates)
+
+            if sent:
+                print(f"✅ {sent} baris historis disuntikkan.")
             else:
-                print("⚠️ Tidak ada data historis yang valid.")
+                print("⚠️ Tidak ada baris baru/berubah.")
 
         except Exception as e:
             print(f"❌ Error Eksekusi: {e}")
 
-        # JEDA MUTLAK: Yahoo Finance sangat kejam terhadap penarikan massal bertahun-tahun.
-        time.sleep(4) 
-
+    tracker.report()
+    print(f"\n📶 {yahoo_governor.summary()}\n📶 {supabase_governor.summary()}")
+    print(f"🧊 {suppressor.summary()}")
     print("\n🎉 AKUISISI DATA HISTORIS 5 TAHUN SELESAI!")
 
 if __name__ == "__main__":
-    ingest_historical_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest harga historis 5 tahun dari Yahoo Finance")
+    parser.add_argument("--max-memory", help="Anggaran RAM, mis. 1GB atau 512MB (batch ticker adaptif)")
+    parser.add_argument("--no-suppress", action="store_true", help="Kirim semua baris tanpa cek hash konten")
+    parser.add_argument("--prime-hashes", action="store_true", help="Bangun ulang cache hash dari database (mesin baru / baris diubah di luar worker)")
+    args = parser.parse_args()
+    ingest_historical_data(args.max_memory, suppress=not args.no_suppress, prime=args.prime_hashes)
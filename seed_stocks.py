@@ -1,22 +1,21 @@
 import os
-import time
 import requests
-from supabase import create_client, Client
 from dotenv import load_dotenv
+from utils import supabase
+from rate_governor import get_governor, governed_get, governed_call
 
 load_dotenv()
 
 INVEZGO_KEY = os.getenv("INVEZGO_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not all([INVEZGO_KEY, SUPABASE_URL, SUPABASE_KEY]):
-    print("❌ Error: Pastikan file .env sudah diisi lengkap!")
-    exit()
+def seed_master_data():
+    if not INVEZGO_KEY:
+        print("❌ Error: Pastikan file .env sudah diisi lengkap (INVEZGO_API_KEY)!")
+        return
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase_governor = get_governor("supabase")
+    invezgo_governor = get_governor("invezgo")
 
-def seed_master_data():
     print("🚀 MEMULAI SINKRONISASI MASTER EMITEN (Invezgo API) -> TABEL 'emitens'")
 
     url_list = "https://api.invezgo.com/analysis/list/stock"
@@ -58,21 +57,20 @@ def seed_master_data():
             })
             
             # Eksekusi per 50 data dengan penanganan error individual
+            # MITIGASI STREAM RESET: Laju upsert diatur governor Supabase, bukan jeda tetap
             if len(batch_data) >= BATCH_SIZE:
                 try:
-                    supabase.table("emitens").upsert(batch_data, on_conflict="ticker").execute()
+                    governed_call(lambda: supabase.table("emitens").upsert(batch_data, on_conflict="ticker").execute(), supabase_governor)
                     print(f"   => Tersimpan {index + 1} / {total_stocks} emiten...")
                 except Exception as e:
                     print(f"   ❌ Gagal upsert batch pada index {index}: {e}")
                 
                 batch_data = []
-                # MITIGASI STREAM RESET: Jeda napas untuk Supabase
-                time.sleep(0.5) 
                 
         # Simpan sisa data yang kurang dari 50
         if batch_data:
             try:
-                supabase.table("emitens").upsert(batch_data, on_conflict="ticker").execute()
+                governed_call(lambda: supabase.table("emitens").upsert(batch_data, on_conflict="ticker").execute(), supabase_governor)
                 print(f"   => Sisa data tersimpan.")
             except Exception as e:
                 print(f"   ❌ Gagal upsert sisa data: {e}")
@@ -88,12 +86,13 @@ def seed_master_data():
         session = requests.Session()
         session.headers.update({"Authorization": f"Bearer {INVEZGO_KEY}"})
         
-        # Jika kena Rate Limit (429) atau Server Error (5xx), sistem akan otomatis mencoba ulang 3x
-        # dengan jeda waktu yang terus meningkat (1s, 2s, 4s)
-        retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+        # Retry adapter hanya untuk error koneksi. Rate Limit (429) / Server Error (5xx) dicoba ulang
+        # oleh governor (AIMD) yang sekaligus menurunkan laju request berikutnya: tanpa retry status & tanpa
+        # menunggu Retry-After di adapter, agar governor melihat setiap throttle (dan retry tidak bertumpuk).
+        retries = Retry(total=3, backoff_factor=1, status=0, respect_retry_after_header=False, raise_on_status=False)
         session.mount("https://", HTTPAdapter(max_retries=retries))
 
-        # 2. EKSTRAKSI SEKTOR (Dengan Kecepatan Rasional)
+        # 2. EKSTRAKSI SEKTOR (Kecepatan adaptif: secepat yang diizinkan Invezgo)
         print("\n⏳ Mengambil data sektor (Ini akan memakan waktu untuk menghindari pemblokiran)...")
         for index, stock in enumerate(clean_stock_list):
             ticker = stock.get('code')
@@ -102,26 +101,25 @@ def seed_master_data():
             try:
                 url_detail = f"https://api.invezgo.com/analysis/information/{ticker}"
                 # Gunakan session.get (bukan requests.get) dan naikkan batas toleransi timeout ke 10 detik
-                res_det = session.get(url_detail, timeout=10)
+                res_det = governed_get(session, url_detail, invezgo_governor, timeout=10)
                 
                 if res_det.status_code == 200:
                     info = res_det.json()
                     update_payload = {
                         "sector": info.get('sector') or "Others"
                     }
-                    supabase.table("emitens").update(update_payload).eq("ticker", ticker).execute()
+                    governed_call(lambda: supabase.table("emitens").update(update_payload).eq("ticker", ticker).execute(),
+                                  supabase_governor)
                 else:
                     failed_details.append(ticker)
-                
-                # MITIGASI RATE LIMIT: Jeda waktu rasional. Maksimal 3-4 request per detik.
-                time.sleep(0.3) 
 
             except requests.exceptions.Timeout:
                 failed_details.append(ticker)
             except Exception as e:
                 failed_details.append(ticker)
 
-        print("\n\n🎉 SELESAI! Tabel 'emitens' siap digunakan.")
+        print(f"\n\n📶 {invezgo_governor.summary()}\n📶 {supabase_governor.summary()}")
+        print("\n🎉 SELESAI! Tabel 'emitens' siap digunakan.")
         if failed_details:
              print(f"⚠️ Masih ada {len(failed_details)} saham yang gagal (Kemungkinan data tidak ada di Invezgo). Aman untuk dilanjutkan.")
 
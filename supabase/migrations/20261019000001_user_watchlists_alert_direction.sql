@@ -0,0 +1,5 @@
+-- Arah alert harga: 'above' (terpicu saat harga >= threshold, perilaku lama) atau 'below' (harga <= threshold).
+-- Dibaca oleh worker_price_alerts (check_price_alerts) dan worker_alert_stream.
+alter table public.user_watchlists
+    add column if not exists alert_direction text not null default 'above'
+        check (alert_direction in ('above', 'below'));
@@ -0,0 +1,7 @@
+-- Antrian ticker yang technical_features-nya harus dihitung ulang setelah aksi korporasi (split/dividen).
+-- Diisi worker_market_yfinance (feature_queue.mark_dirty), dikosongkan worker_feature_engineering.
+create table if not exists public.feature_recompute_queue (
+    ticker text primary key,
+    reason text,
+    marked_at timestamp not null default now()
+);
@@ -0,0 +1,16 @@
+-- Riwayat EPS/BVPS point-in-time per (ticker, periode laporan), cache tarikan Invezgo keystat.
+-- available_date = akhir periode + jeda publikasi: angka baru boleh dipakai model sejak tanggal ini.
+-- fetched_at disimpan tanpa zona waktu (waktu lokal worker) karena dibandingkan dengan datetime.now().
+create table if not exists public.fundamentals_pit (
+    ticker text not null,
+    period_date date not null,
+    available_date date not null,
+    eps double precision,
+    bvps double precision,
+    graham_number double precision,
+    fetched_at timestamp,
+    primary key (ticker, period_date)
+);
+
+-- margin_of_safety NULL = emiten tanpa tanggal periode fundamental (bukan 0)
+alter table public.technical_features alter column margin_of_safety drop not null;
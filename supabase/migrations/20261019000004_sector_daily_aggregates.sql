@@ -0,0 +1,20 @@
+-- Ringkasan per (sektor, hari bursa); sektor 'ALL' = breadth seluruh pasar.
+-- Ditulis inkremental oleh sector_aggregates.refresh_aggregates, dibaca GET /api/sectors.
+create table if not exists public.sector_daily_aggregates (
+    sector text not null,
+    calc_date date not null,
+    n_tickers integer not null,
+    grade_a integer not null default 0,
+    grade_b integer not null default 0,
+    grade_c integer not null default 0,
+    median_rsi double precision,
+    median_mfi double precision,
+    median_mos double precision,
+    pct_above_target double precision,
+    updated_at timestamp,
+    primary key (sector, calc_date)
+);
+
+-- GET /api/sectors tanpa tanggal: order by calc_date desc limit 1
+create index if not exists sector_daily_aggregates_calc_date_idx
+    on public.sector_daily_aggregates (calc_date desc);
@@ -0,0 +1,10 @@
+-- Versi indikator + tanggal terakhir yang sudah dihitung per (ticker, kolom technical_features).
+-- Dasar keputusan backfill penuh vs inkremental di worker_feature_engineering (indicators.plan_columns).
+create table if not exists public.feature_column_state (
+    ticker text not null,
+    column_name text not null,
+    version integer not null,
+    last_date date,
+    updated_at timestamp,
+    primary key (ticker, column_name)
+);
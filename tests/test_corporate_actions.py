@@ -0,0 +1,117 @@
+import types
+
+import pandas as pd
+import pytest
+
+import corporate_actions as ca
+from corporate_actions import ADJ_TOLERANCE, detect_adjustment_factor, readjust_history
+
+
+class FakePrices:
+    """daily_market_prices di memori: select ... eq(ticker) .lt(trade_date) dan upsert per (ticker, trade_date)."""
+
+    def __init__(self, rows):
+        self.rows = {(r['ticker'], r['trade_date']): dict(r) for r in rows}
+        self.upserted = []
+
+    def table(self, name):
+        assert name == "daily_market_prices"
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    def __init__(self, store):
+        self.store = store
+        self.filters = []
+        self.payload = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r[column] == value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r[column] < value)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.payload = rows
+        return self
+
+    def execute(self):
+        if self.payload is not None:
+            for r in self.payload:
+                self.store.rows[(r['ticker'], r['trade_date'])].update(r)
+            self.store.upserted.extend(self.payload)
+            return types.SimpleNamespace(data=self.payload)
+        rows = [dict(r) for r in sorted(self.store.rows.values(), key=lambda r: r['trade_date'])
+                if all(f(r) for f in self.filters)]
+        return types.SimpleNamespace(data=rows)
+
+
+def fresh_window(adj_closes, start="2026-10-12"):
+    index = pd.bdate_range(start, periods=len(adj_closes))
+    return pd.DataFrame({"Adj Close": adj_closes}, index=index)
+
+
+def stored(rows):
+    return {date: {"adjusted_close": adj, "is_manually_overridden": locked} for date, adj, locked in rows}
+
+
+def price_row(ticker, date, adj, locked=False):
+    return {"ticker": ticker, "trade_date": date, "open_price": adj, "high_price": adj, "low_price": adj,
+            "raw_close": adj, "adjusted_close": adj, "volume": 100, "is_manually_overridden": locked}
+
+
+def test_factor_within_tolerance_is_noise():
+    data = fresh_window([100 * (1 + ADJ_TOLERANCE / 2), 101.0])
+    factor, date = detect_adjustment_factor(data, stored([("2026-10-12", 100.0, False), ("2026-10-13", 101.0, False)]))
+    assert (factor, date) == (None, None)
+
+
+def test_split_factor_comes_from_earliest_overlapping_day():
+    # Stock split 1:2 -> Yahoo membagi dua seluruh riwayat sebelum ex-date
+    data = fresh_window([50.0, 51.0, 52.0])
+    factor, date = detect_adjustment_factor(
+        data, stored([("2026-10-12", 100.0, False), ("2026-10-13", 102.0, False)]))
+    assert factor == pytest.approx(0.5)
+    assert date == "2026-10-12"
+
+
+def test_overridden_rows_are_not_used_as_reference():
+    data = fresh_window([50.0, 51.0])
+    # Baris pertama dikunci admin (nilai apa pun) -> pembanding pindah ke hari berikutnya yang identik
+    factor, _ = detect_adjustment_factor(data, stored([("2026-10-12", 999.0, True), ("2026-10-13", 51.0, False)]))
+    assert factor is None
+
+
+def test_readjust_multiplies_only_unlocked_rows_before_window(monkeypatch):
+    fake = FakePrices([
+        price_row("AAA", "2026-10-07", 100.0),
+        price_row("AAA", "2026-10-08", 110.0, locked=True),
+        price_row("AAA", "2026-10-09", 120.0),
+        price_row("AAA", "2026-10-12", 60.0),
+        price_row("BBB", "2026-10-07", 100.0),
+    ])
+    monkeypatch.setattr(ca, "supabase", fake)
+    monkeypatch.setattr(ca, "fetch_all_rows", lambda build_query: build_query().execute().data)
+
+    n_rows = readjust_history("AAA", 0.5, "2026-10-12")
+
+    adj = {key: r['adjusted_close'] for key, r in fake.rows.items()}
+    assert n_rows == 2
+    assert adj[("AAA", "2026-10-07")] == pytest.approx(50.0)
+    assert adj[("AAA", "2026-10-09")] == pytest.approx(60.0)
+    # Dikunci admin, di dalam jendela, dan ticker lain tidak disentuh
+    assert adj[("AAA", "2026-10-08")] == 110.0
+    assert adj[("AAA", "2026-10-12")] == 60.0
+    assert adj[("BBB", "2026-10-07")] == 100.0
+    assert all("is_manually_overridden" not in r for r in fake.upserted)
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from indicators import INDICATORS, complete_rows, revisit_start
+
+
+def test_complete_rows_requires_every_warmed_up_model_feature():
+    n = 40
+    values = {col: pd.Series(np.ones(n)) for col in INDICATORS}
+    values["rsi_14"].iloc[:14] = np.nan
+    values["macd"].iloc[:33] = np.nan
+
+    mask = complete_rows(values)
+
+    assert not mask.iloc[:33].any()
+    assert mask.iloc[33:].all()
+
+
+def test_revisit_start_reopens_the_revision_window():
+    dates = pd.Series(pd.bdate_range("2026-10-01", periods=12).strftime("%Y-%m-%d"))
+
+    assert revisit_start(dates, "2026-10-14", rows=5) == "2026-10-08"
+    # Riwayat tersimpan lebih pendek dari jendela -> mulai dari tanggal pertama
+    assert revisit_start(dates, "2026-10-02", rows=5) == "2026-10-01"
+    # last_date sebelum ekor riwayat yang ditarik -> hanya tanggal setelah last_date
+    assert revisit_start(dates, "2026-09-01", rows=5) == "2026-09-01"
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from model_store import ModelCache, model_path, predict_many
+
+
+class IdentityImputer:
+    def transform(self, X):
+        return X
+
+
+class FixedModel:
+    classes_ = np.array(["A", "B", "C"])
+    feature_importances_ = np.array([1.0, 0.0])
+
+    def predict_proba(self, X):
+        # P(A) = nilai fitur pertama, sisanya ke B
+        p_a = np.clip(X.iloc[:, 0].to_numpy(), 0, 1)
+        return np.column_stack([p_a, 1 - p_a, np.zeros(len(p_a))])
+
+
+class FakeCache:
+    def __init__(self, bundles):
+        self.bundles = bundles
+        self.requested = []
+
+    def get(self, ticker):
+        self.requested.append(ticker)
+        return self.bundles.get(ticker)
+
+
+def bundle():
+    return {
+        "model": FixedModel(),
+        "imputer": IdentityImputer(),
+        "features": ["f1", "f2"],
+        "latest_row": {"f1": 0.9, "f2": 1.0},
+        "prediction_date": "2026-10-19",
+        "feature_date": "2026-10-16",
+    }
+
+
+@pytest.mark.parametrize("ticker", ["../x", "BBCA/../../etc", "BB CA", "", "a.b"])
+def test_model_path_rejects_non_ticker_input(ticker):
+    with pytest.raises(ValueError):
+        model_path(ticker)
+
+
+def test_model_cache_never_touches_disk_for_invalid_ticker(tmp_path, monkeypatch):
+    monkeypatch.setattr("model_store.MODEL_STORE_DIR", str(tmp_path / "models"))
+    (tmp_path / "x.joblib").write_bytes(b"not a pickle")
+    with pytest.raises(ValueError):
+        ModelCache().get("../x")
+
+
+def test_predict_many_reports_item_index_for_each_error():
+    cache = FakeCache({"BBCA": bundle()})
+    items = [
+        {"ticker": "bbca", "overrides": {"f1": 0.2}},
+        {"ticker": "BBCA", "overrides": {"nope": 1.0}},
+        {"ticker": "../x", "overrides": {}},
+        {"ticker": "TLKM", "overrides": {}},
+        {"ticker": "BBCA", "overrides": {}},
+    ]
+
+    results, errors = predict_many(items, cache)
+
+    assert [r["index"] for r in results] == [0, 4]
+    assert [r["predicted_grade"] for r in results] == ["B", "A"]
+    assert [(e["index"], e["ticker"]) for e in errors] == [(1, "BBCA"), (2, "../x"), (3, "TLKM")]
+    assert "../x" not in cache.requested
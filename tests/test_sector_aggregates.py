@@ -0,0 +1,91 @@
+import types
+
+import pandas as pd
+import pytest
+
+import sector_aggregates as sa
+from sector_aggregates import SectorCache, compute_aggregates
+
+
+def test_tickers_without_graham_number_are_excluded_from_mos_stats():
+    features = pd.DataFrame({
+        "ticker": ["AAA", "BBB", "CCC", "DDD"],
+        "calc_date": ["2026-10-16"] * 4,
+        "rsi_14": [30.0, 40.0, 50.0, 60.0],
+        "mfi_14": [10.0, 20.0, 30.0, 40.0],
+        # CCC & DDD tidak punya Graham number -> MOS placeholder 0
+        "margin_of_safety": [-20.0, 40.0, 0.0, 0.0],
+    })
+    grades = pd.DataFrame({"ticker": ["AAA"], "prediction_date": ["2026-10-16"], "predicted_grade": ["A"]})
+
+    agg = compute_aggregates(features, grades, {t: "Bank" for t in features["ticker"]})
+    market = agg[agg["sector"] == "ALL"].iloc[0]
+
+    assert market["n_tickers"] == 4
+    assert market["grade_a"] == 1
+    assert market["median_rsi"] == 45.0
+    assert market["median_mos"] == 10.0
+    assert market["pct_above_target"] == 50.0
+
+
+def test_sector_with_no_fundamentals_has_empty_mos_stats():
+    features = pd.DataFrame({
+        "ticker": ["AAA"], "calc_date": ["2026-10-16"],
+        "rsi_14": [30.0], "mfi_14": [10.0], "margin_of_safety": [0.0],
+    })
+    agg = compute_aggregates(features, pd.DataFrame(), {"AAA": "Tech"})
+    tech = agg[agg["sector"] == "Tech"].iloc[0]
+    assert pd.isna(tech["median_mos"])
+    assert pd.isna(tech["pct_above_target"])
+
+
+class FakeAggTable:
+    def __init__(self):
+        self.queries = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.calc_date = value
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def execute(self):
+        self.queries += 1
+        return types.SimpleNamespace(data=[{"sector": "ALL", "calc_date": self.calc_date}])
+
+
+def test_sector_cache_rejects_non_iso_dates(monkeypatch):
+    fake = FakeAggTable()
+    monkeypatch.setattr(sa, "supabase", fake)
+    cache = SectorCache()
+
+    for junk in ["junk", "2026-13-01", "../x", "2026-10-16' or 1=1"]:
+        with pytest.raises(ValueError):
+            cache.get(junk)
+    assert fake.queries == 0
+    assert cache.stats()["entries"] == 0
+
+
+def test_sector_cache_evicts_least_recently_used(monkeypatch):
+    fake = FakeAggTable()
+    monkeypatch.setattr(sa, "supabase", fake)
+    cache = SectorCache(ttl=3600, max_entries=2)
+
+    cache.get("2026-10-14")
+    cache.get("2026-10-15")
+    cache.get("2026-10-14")  # hit -> 10-15 menjadi yang paling lama tidak dipakai
+    cache.get("2026-10-16")
+
+    assert cache.stats()["entries"] == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.get("2026-10-14")
+    assert cache.hits == 2
+    cache.get("2026-10-15")
+    assert cache.misses == 4
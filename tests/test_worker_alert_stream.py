@@ -0,0 +1,164 @@
+import asyncio
+import json
+import types
+
+import worker_alert_stream as ws
+from worker_alert_stream import AlertBook, AlertStreamEvaluator, FileTickSource
+
+
+class FakeSupabase:
+    """Mencatat setiap UPDATE user_watchlists ... IN (ids)."""
+
+    def __init__(self):
+        self.updated = []
+
+    def table(self, name):
+        return self
+
+    def update(self, values):
+        return self
+
+    def in_(self, column, ids):
+        self._ids = list(ids)
+        return self
+
+    def execute(self):
+        self.updated.extend(self._ids)
+        return types.SimpleNamespace(data=[])
+
+
+def write_ticks(path, ticks):
+    with open(path, "w") as f:
+        for i, (ticker, price) in enumerate(ticks):
+            f.write(json.dumps({"ticker": ticker, "price": price, "ts": 1_700_000_000 + i}) + "\n")
+    return str(path)
+
+
+def make_book(alerts):
+    book = AlertBook()
+    for alert_id, ticker, threshold, direction in alerts:
+        book.add(alert_id, ticker, threshold, direction)
+    return book
+
+
+def run_replay(monkeypatch, tmp_path, ticks, loader):
+    fake = FakeSupabase()
+    monkeypatch.setattr(ws, "supabase", fake)
+    monkeypatch.setattr(ws, "load_alert_book", loader)
+    evaluator = AlertStreamEvaluator(FileTickSource(write_ticks(tmp_path / "ticks.jsonl", ticks)),
+                                     flush_interval=3600, refresh_interval=3600)
+    asyncio.run(evaluator.run())
+    return evaluator, fake
+
+
+def test_replay_triggers_above_and_below_once(monkeypatch, tmp_path):
+    alerts = [(1, "AAA", 110.0, "above"), (2, "AAA", 90.0, "below"),
+              (3, "BBB", 50.0, "above"), (4, "AAA", 120.0, "above")]
+    loader = lambda: (make_book(alerts), {a[0] for a in alerts})
+    ticks = [("AAA", 100), ("AAA", 111), ("AAA", 112), ("aaa", 89), ("AAA", 85), ("BBB", 40)]
+
+    evaluator, fake = run_replay(monkeypatch, tmp_path, ticks, loader)
+
+    assert sorted(fake.updated) == [1, 2]
+    assert evaluator.triggered_count == 2
+    assert evaluator.book.size == 2
+
+
+def test_refresh_drops_alerts_fired_while_loading(monkeypatch, tmp_path):
+    alerts = [(1, "AAA", 110.0, "above")]
+    evaluator = None
+
+    def stale_loader():
+        # Snapshot DB diambil sebelum alert 1 terpicu; alert itu terpicu selama query berjalan
+        book = make_book(alerts)
+        if evaluator is not None:
+            evaluator.fired.add(1)
+        return book, {1}
+
+    fake = FakeSupabase()
+    monkeypatch.setattr(ws, "supabase", fake)
+    monkeypatch.setattr(ws, "load_alert_book", stale_loader)
+    evaluator = AlertStreamEvaluator(FileTickSource(write_ticks(tmp_path / "ticks.jsonl", [("AAA", 115)])),
+                                     flush_interval=3600, refresh_interval=3600)
+
+    asyncio.run(evaluator._refresh())
+    assert evaluator.book.size == 0
+    assert evaluator.fired == {1}
+
+    asyncio.run(evaluator.run())
+    assert fake.updated == []
+    assert evaluator.triggered_count == 0
+
+
+def test_periodic_task_survives_errors(monkeypatch):
+    evaluator = AlertStreamEvaluator(source=None)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("network down")
+
+    async def scenario():
+        task = asyncio.create_task(evaluator._periodic(0, flaky))
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert len(calls) >= 3
+
+
+def test_final_flush_retries_then_logs_unwritten_ids(monkeypatch, tmp_path, capsys):
+    class FlakySupabase(FakeSupabase):
+        def __init__(self, failures):
+            super().__init__()
+            self.failures = failures
+
+        def execute(self):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("502 Bad Gateway")
+            return super().execute()
+
+    monkeypatch.setattr(ws, "FINAL_FLUSH_RETRY_DELAY", 0)
+    loader = lambda: (make_book([(1, "AAA", 110.0, "above")]), {1})
+    monkeypatch.setattr(ws, "load_alert_book", loader)
+
+    # Gagal sekali -> percobaan berikutnya menulis batch yang dikembalikan ke pending
+    monkeypatch.setattr(ws, "supabase", FlakySupabase(failures=1))
+    evaluator = AlertStreamEvaluator(FileTickSource(write_ticks(tmp_path / "a.jsonl", [("AAA", 111)])),
+                                     flush_interval=3600, refresh_interval=3600)
+    asyncio.run(evaluator.run())
+    assert ws.supabase.updated == [1]
+    assert evaluator.pending == []
+
+    # Gagal terus -> id yang tidak tertulis dicatat, bukan dibuang diam-diam
+    monkeypatch.setattr(ws, "supabase", FlakySupabase(failures=ws.FINAL_FLUSH_ATTEMPTS))
+    evaluator = AlertStreamEvaluator(FileTickSource(write_ticks(tmp_path / "b.jsonl", [("AAA", 111)])),
+                                     flush_interval=3600, refresh_interval=3600)
+    asyncio.run(evaluator.run())
+    assert evaluator.pending == [1]
+    assert "TIDAK tertulis ke database: 1" in capsys.readouterr().out
+
+
+def test_rearmed_alert_fires_again(monkeypatch, tmp_path):
+    fake = FakeSupabase()
+    monkeypatch.setattr(ws, "supabase", fake)
+    evaluator = AlertStreamEvaluator(source=None)
+
+    async def scenario():
+        # Alert 1 terpicu dan tertulis ke DB
+        monkeypatch.setattr(ws, "load_alert_book", lambda: (make_book([(1, "AAA", 110.0, "above")]), {1}))
+        await evaluator._refresh()
+        evaluator.fired.update(evaluator.book.on_tick("AAA", 111))
+        evaluator.pending.append(1)
+        await evaluator._flush()
+        assert fake.updated == [1]
+
+        # User me-reset alert 1 (is_triggered kembali False) sebelum refresh berikutnya
+        await evaluator._refresh()
+        assert evaluator.fired == set()
+        assert evaluator.book.on_tick("AAA", 112) == [1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+import write_suppression as wsup
+from write_suppression import WriteSuppressor, clear_hashes
+
+
+def rows(ticker, values):
+    return [{"ticker": ticker, "trade_date": f"2026-10-{12 + i}", "adjusted_close": v} for i, v in enumerate(values)]
+
+
+def suppressor(path, **kwargs):
+    return WriteSuppressor("daily_market_prices", "trade_date", ["adjusted_close"], path=str(path), **kwargs)
+
+
+def test_unchanged_rows_are_suppressed_after_commit(tmp_path):
+    s = suppressor(tmp_path / "h.sqlite")
+    s.commit(rows("AAA", [100.0, 101.0]))
+    assert s.filter(rows("AAA", [100.0, 102.0])) == rows("AAA", [100.0, 102.0])[1:]
+
+
+def test_expired_hashes_are_resent(tmp_path, monkeypatch):
+    path = tmp_path / "h.sqlite"
+    suppressor(path).commit(rows("AAA", [100.0]))
+
+    # Sebelas hari kemudian, TTL 10 hari -> hash lama diabaikan
+    now = time.time()
+    monkeypatch.setattr(wsup.time, "time", lambda: now + 11 * 86400)
+    assert suppressor(path, ttl_days=10).filter(rows("AAA", [100.0])) == rows("AAA", [100.0])
+    assert suppressor(path, ttl_days=0).filter(rows("AAA", [100.0])) == []
+
+
+def test_invalidate_drops_only_the_given_tickers(tmp_path):
+    s = suppressor(tmp_path / "h.sqlite")
+    s.commit(rows("AAA", [100.0]) + rows("BBB", [50.0]))
+    s.invalidate(["AAA"])
+
+    fresh = suppressor(tmp_path / "h.sqlite")
+    assert fresh.filter(rows("AAA", [100.0]) + rows("BBB", [50.0])) == rows("AAA", [100.0])
+
+
+def test_clear_hashes_covers_per_column_namespaces(tmp_path):
+    path = tmp_path / "h.sqlite"
+    for col in ["rsi_14", "macd"]:
+        WriteSuppressor("technical_features", "calc_date", [col], path=str(path),
+                        namespace=f"technical_features.{col}").commit([{"ticker": "AAA", "calc_date": "2026-10-16", col: 1.0}])
+    suppressor(path).commit(rows("AAA", [100.0]))
+
+    db = sqlite3.connect(path)
+    assert clear_hashes(db, ["technical_features"]) == 2
+    assert [r[0] for r in db.execute("SELECT tbl FROM content_hashes")] == ["daily_market_prices"]
+
+
+def test_store_from_before_ttl_is_upgraded(tmp_path):
+    path = tmp_path / "h.sqlite"
+    db = sqlite3.connect(path)
+    db.execute("""CREATE TABLE content_hashes (tbl TEXT NOT NULL, ticker TEXT NOT NULL, key_date TEXT NOT NULL,
+                  hash INTEGER NOT NULL, PRIMARY KEY (tbl, ticker, key_date)) WITHOUT ROWID""")
+    db.execute("INSERT INTO content_hashes VALUES ('daily_market_prices', 'AAA', '2026-10-12', 1)")
+    db.commit()
+
+    s = suppressor(path)
+    # Hash lama (tanpa stored_at) kedaluwarsa -> dikirim ulang sekali, lalu ditekan seperti biasa
+    assert s.filter(rows("AAA", [100.0])) == rows("AAA", [100.0])
+    s.commit(rows("AAA", [100.0]))
+    assert suppressor(path).filter(rows("AAA", [100.0])) == []
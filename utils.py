@@ -1,5 +1,5 @@
 import os
-from supabase import create_client, Client
+import threading
 from dotenv import load_dotenv
 
 # Load Config
@@ -7,12 +7,31 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not all([SUPABASE_URL, SUPABASE_KEY]):
-    print("❌ Error: Pastikan file .env (SUPABASE_URL & KEY) sudah diisi!")
-    exit()
+_client = None
+_client_lock = threading.Lock()
 
-# Inisialisasi Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def get_supabase():
+    """
+    Membuat client Supabase saat PERTAMA kali dibutuhkan (bukan saat import).
+    Import library supabase cukup berat, jadi `--help` / startup API tidak ikut membayar biayanya.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not all([SUPABASE_URL, SUPABASE_KEY]):
+                    raise RuntimeError("❌ Error: Pastikan file .env (SUPABASE_URL & KEY) sudah diisi!")
+                from supabase import create_client
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+class _LazySupabase:
+    # Proxy agar seluruh pemanggil tetap bisa menulis `supabase.table(...)` seperti biasa
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+# Inisialisasi Supabase (malas / lazy)
+supabase = _LazySupabase()
 
 def get_all_tickers():
     """
@@ -33,4 +52,23 @@ def get_all_tickers():
         if len(res.data) < page_size:
             break
             
-    return all_tickers
\ No newline at end of file
+    return all_tickers
+
+def fetch_all_rows(build_query, page_size=1000):
+    """
+    Menarik SELURUH baris dari query Supabase dengan paginasi .range().
+    build_query: fungsi tanpa argumen yang mengembalikan query builder baru (tanpa .execute()).
+    """
+    rows = []
+    start = 0
+
+    while True:
+        res = build_query().range(start, start + page_size - 1).execute()
+        batch = res.data or []
+        rows.extend(batch)
+
+        if len(batch) < page_size:
+            break
+        start += page_size
+
+    return rows
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import csv
+import heapq
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from utils import supabase, fetch_all_rows
+
+# Flush terakhir saat stream berhenti: dicoba ulang beberapa kali karena tidak ada siklus flush berikutnya
+FINAL_FLUSH_ATTEMPTS = 3
+FINAL_FLUSH_RETRY_DELAY = 2.0
+
+# =========================================================================
+# SUMBER TICK (Pluggable). Setiap sumber cukup mengimplementasikan ticks().
+# =========================================================================
+class TickSource(ABC):
+    @abstractmethod
+    def ticks(self):
+        """Async iterator (biasanya async generator) yang menghasilkan (ticker, price, ts_epoch)."""
+
+class FileTickSource(TickSource):
+    """
+    Memutar ulang tick dari file .jsonl ({"ticker", "price", "ts"}) atau .csv (ticker,price,ts).
+    speed=0 -> secepat mungkin (tes/benchmark), speed=1 -> tempo asli sesuai selisih ts.
+    """
+
+    def __init__(self, path, speed=0.0):
+        self.path = path
+        self.speed = speed
+
+    def _rows(self):
+        with open(self.path, newline="") as f:
+            if self.path.endswith(".csv"):
+                yield from csv.DictReader(f)
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    async def ticks(self):
+        prev_ts = None
+        for i, row in enumerate(self._rows()):
+            ts = _parse_ts(row.get("ts"))
+            if self.speed > 0 and prev_ts is not None and ts > prev_ts:
+                await asyncio.sleep((ts - prev_ts) / self.speed)
+            elif i % 1000 == 0:
+                # Beri kesempatan flusher & refresher berjalan saat replay tanpa jeda
+                await asyncio.sleep(0)
+            prev_ts = ts
+            yield row["ticker"].upper(), float(row["price"]), ts
+
+def _parse_ts(value):
+    if value in (None, ""):
+        return time.time()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+# =========================================================================
+# BUKU ALERT: Heap dua sisi per ticker
+# =========================================================================
+class AlertBook:
+    """
+    above[ticker] = min-heap (threshold, id) -> terpicu saat harga >= threshold terkecil.
+    below[ticker] = max-heap (-threshold, id) -> terpicu saat harga <= threshold terbesar.
+    Setiap tick hanya mem-pop alert yang benar-benar terlewati: O(k log n), bukan O(n).
+    """
+
+    def __init__(self):
+        self.above = {}
+        self.below = {}
+        self.size = 0
+
+    def add(self, alert_id, ticker, threshold, direction="above"):
+        if direction == "below":
+            heapq.heappush(self.below.setdefault(ticker, []), (-threshold, alert_id))
+        else:
+            heapq.heappush(self.above.setdefault(ticker, []), (threshold, alert_id))
+        self.size += 1
+
+    def on_tick(self, ticker, price):
+        crossed = []
+        heap = self.above.get(ticker)
+        while heap and heap[0][0] <= price:
+            crossed.append(heapq.heappop(heap)[1])
+        heap = self.below.get(ticker)
+        while heap and -heap[0][0] >= price:
+            crossed.append(heapq.heappop(heap)[1])
+        self.size -= len(crossed)
+        return crossed
+
+    def discard(self, alert_ids):
+        """Buang alert tertentu dari buku (mis. yang sudah terpicu lokal tapi belum terlihat di DB)."""
+        alert_ids = set(alert_ids)
+        if not alert_ids:
+            return
+        for heaps in (self.above, self.below):
+            for ticker, heap in heaps.items():
+                kept = [entry for entry in heap if entry[1] not in alert_ids]
+                if len(kept) != len(heap):
+                    heapq.heapify(kept)
+                    self.size -= len(heap) - len(kept)
+                    heaps[ticker] = kept
+
+def load_alert_book():
+    rows = fetch_all_rows(lambda: supabase.table("user_watchlists")
+                          .select("*").eq("is_triggered", False).order("id"))
+    book = AlertBook()
+    for alert in rows:
+        if alert.get('alert_threshold_price') is None:
+            continue
+        book.add(alert['id'], alert['ticker'].upper(), float(alert['alert_threshold_price']),
+                 alert.get('alert_direction') or "above")
+    return book, {alert['id'] for alert in rows}
+
+# =========================================================================
+# EVALUATOR
+# =========================================================================
+class AlertStreamEvaluator:
+    def __init__(self, source, batch_size=50, flush_interval=1.0, refresh_interval=60.0):
+        self.source = source
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.book = AlertBook()
+        self.pending = []
+        # Alert yang sudah terpicu lokal tapi mungkin belum terlihat di DB saat refresh
+        self.fired = set()
+        # id -> waktu monotonic UPDATE is_triggered selesai (pembeda snapshot basi vs alert yang di-reset user)
+        self._written = {}
+        self.tick_count = 0
+        self.triggered_count = 0
+        self._flush_lock = asyncio.Lock()
+
+    async def _refresh(self):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        book, open_ids = await loop.run_in_executor(None, load_alert_book)
+        # Terpicu lokal, sudah tertulis SEBELUM snapshot diambil, tapi kembali terbuka -> di-reset (re-arm) user
+        rearmed = {i for i in self.fired & open_ids if self._written.get(i, started) < started}
+        # Sisanya: terbuka di DB -> snapshot basi (belum/sedang ditulis), tidak terbuka -> sudah tercatat terpicu
+        self.fired = (self.fired & open_ids) - rearmed
+        self._written = {i: t for i, t in self._written.items() if i in self.fired}
+        book.discard(self.fired)
+        self.book = book
+        print(f"🔁 Buku alert dimuat ulang: {book.size} alert aktif.")
+
+    async def _flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+
+        # UPDATE BATCH: memicu Supabase Realtime di frontend (sama seperti check_price_alerts)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, lambda: supabase.table("user_watchlists")
+                                       .update({"is_triggered": True, "is_notified": False})
+                                       .in_("id", batch).execute())
+            written_at = time.monotonic()
+            self._written.update((alert_id, written_at) for alert_id in batch)
+            print(f"   📧 {len(batch)} alert terpicu ditulis ke database.")
+        except Exception as e:
+            print(f"   ❌ Gagal flush {len(batch)} alert, dicoba lagi: {e}")
+            async with self._flush_lock:
+                self.pending = batch + self.pending
+
+    async def _final_flush(self):
+        # _flush mengembalikan batch yang gagal ke pending; setelah percobaan habis, id yang tersisa dicatat
+        # agar bisa ditandai manual (alert ini sudah terpicu dan tidak akan dievaluasi ulang oleh proses ini)
+        for attempt in range(FINAL_FLUSH_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(FINAL_FLUSH_RETRY_DELAY)
+            await self._flush()
+            if not self.pending:
+                return
+        print(f"   ❌ {len(self.pending)} alert terpicu TIDAK tertulis ke database: "
+              f"{', '.join(str(i) for i in self.pending)}")
+
+    async def _periodic(self, interval, fn):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await fn()
+            except Exception as e:
+                # Satu kegagalan jaringan/DB tidak boleh mematikan tugas latar selamanya
+                print(f"   ⚠️ Tugas latar {fn.__name__} gagal, dicoba lagi dalam {interval}s: {e}")
+
+    async def run(self):
+        print("📡 [ALERT STREAM] Memulai evaluator alert intraday...")
+        await self._refresh()
+
+        background = [
+            asyncio.create_task(self._periodic(self.flush_interval, self._flush)),
+            asyncio.create_task(self._periodic(self.refresh_interval, self._refresh)),
+        ]
+        started = time.monotonic()
+
+        try:
+            async for ticker, price, _ in self.source.ticks():
+                self.tick_count += 1
+                crossed = self.book.on_tick(ticker, price)
+                if not crossed:
+                    continue
+
+                print(f"   🚨 TRIGGERED! {ticker} @ {price} -> {len(crossed)} alert")
+                self.fired.update(crossed)
+                self.pending.extend(crossed)
+                self.triggered_count += len(crossed)
+                if len(self.pending) >= self.batch_size:
+                    await self._flush()
+        finally:
+            for task in background:
+                task.cancel()
+            await self._final_flush()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"🏁 Stream selesai. {self.tick_count} tick ({self.tick_count / elapsed:,.0f} tick/detik), "
+              f"{self.triggered_count} alert terpicu.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluator alert harga intraday berbasis stream tick")
+    parser.add_argument("--replay", required=True, help="File tick .jsonl/.csv untuk diputar ulang")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = secepat mungkin, 1 = tempo asli")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--refresh-interval", type=float, default=60.0)
+    args = parser.parse_args()
+
+    evaluator = AlertStreamEvaluator(
+        FileTickSource(args.replay, args.speed),
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        refresh_interval=args.refresh_interval,
+    )
+    asyncio.run(evaluator.run())
+
+if __name__ == "__main__":
+    main()
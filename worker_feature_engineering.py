@@ -1,119 +1,172 @@
-import os
-import time
-import math
-import requests
+import argparse
 import pandas as pd
-import pandas_ta as ta
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from utils import supabase, get_all_tickers
-
-load_dotenv()
-INVEZGO_KEY = os.getenv("INVEZGO_API_KEY")
-
-# 1. PERTAHANAN SESI INVEZGO
-session = requests.Session()
-session.headers.update({"Authorization": f"Bearer {INVEZGO_KEY}"})
-retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-session.mount("https://", HTTPAdapter(max_retries=retries))
-
-def get_graham_number(ticker):
-    url = f"https://api.invezgo.com/analysis/keystat/{ticker}?type=Q&limit=1"
-    try:
-        res = session.get(url, timeout=10)
-        if res.status_code == 200:
-            data = res.json()
-            if data and 'rows' in data and isinstance(data['rows'], list):
-                eps = bvps = 0
-                for r in data['rows']:
-                    name = r.get('name', '').upper()
-                    if "EPS" in name or "EARNING PER SHARE" in name:
-                        vals = r.get('values', [])
-                        if vals: eps = float(vals[0].get('amount', 0) or 0)
-                    elif "BVPS" in name or "BOOK VALUE PER SHARE" in name:
-                        vals = r.get('values', [])
-                        if vals: bvps = float(vals[0].get('amount', 0) or 0)
-                
-                if eps > 0 and bvps > 0:
-                    graham_product = 22.5 * eps * bvps
-                    if graham_product > 0:
-                        return math.sqrt(graham_product)
-        return 0
-    except Exception:
-        return 0
-
-def engineer_features():
-    tickers = get_all_tickers()
+from datetime import datetime, timedelta
+from utils import supabase, get_all_tickers, fetch_all_rows
+from rate_governor import get_governor, governed_call
+from write_suppression import WriteSuppressor
+from feature_queue import get_dirty_tickers, clear_dirty
+from fundamentals_pit import FundamentalsStore
+from sector_aggregates import refresh_aggregates
+from indicators import (INDICATORS, REVISION_ROWS, feature_columns, price_inputs, complete_rows, revisit_start,
+                        load_column_state, save_column_state, plan_columns)
+
+FEATURE_COLUMNS = feature_columns()
+
+supabase_governor = get_governor("supabase")
+
+def load_prices(ticker, columns, since=None):
+    # PERTAHANAN JARINGAN: Retry Select di bawah governor Supabase (jeda adaptif, bukan sleep tetap)
+    def query():
+        q = supabase.table("daily_market_prices").select(", ".join(["trade_date"] + columns)).eq("ticker", ticker)
+        if since:
+            q = q.gte("trade_date", since)
+        return q.order("trade_date", desc=False)
+
+    rows = governed_call(lambda: fetch_all_rows(query), supabase_governor)
+    df = pd.DataFrame(rows)
+    # Konversi ke numerik paksa
+    for col in columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+def _tail_start(incremental):
+    """Tanggal awal tarikan harga untuk hitungan inkremental: ekor riwayat secukupnya untuk pemanasan."""
+    tail_rows = max(INDICATORS[col].tail_rows for col in incremental) + REVISION_ROWS
+    # Hari bursa -> hari kalender (5 dari 7 hari) + cadangan libur nasional
+    days = tail_rows * 7 // 5 + 15
+    return (datetime.fromisoformat(min(incremental.values())) - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def engineer_features(suppress=True, prime=False, dirty_only=False, rebuild=(), chunk_size=1000):
+    """
+    Menghitung kolom technical_features dari registry indikator (indicators.py).
+    Per ticker, hanya kolom yang belum ada / versinya berubah yang di-backfill penuh; kolom lain hanya
+    dihitung untuk tanggal setelah last_date-nya. Payload per kolom, jadi backfill satu indikator baru
+    tidak menulis ulang kolom lain.
+    """
+    # Ticker yang riwayat harganya disesuaikan ulang (aksi korporasi) menunggu dihitung ulang
+    dirty = set(get_dirty_tickers())
+    tickers = sorted(dirty) if dirty_only else get_all_tickers()
     total = len(tickers)
-    print(f"🧠 [FEATURE ENGINEERING] Memulai rekayasa fitur (Tech, Funda, Volume) untuk {total} emiten...")
+    rebuild = set(rebuild)
+    # Riwayat indikator lama hampir selalu identik: hanya kirim nilai baru/berubah (hash per kolom)
+    suppressors = {col: WriteSuppressor("technical_features", "calc_date", [col], enabled=suppress,
+                                        namespace=f"technical_features.{col}")
+                   for col in FEATURE_COLUMNS}
+    # Riwayat EPS/BVPS point-in-time: satu tarikan massal dari cache, Invezgo hanya untuk ticker basi/baru
+    funda_store = FundamentalsStore().load(tickers if dirty_only else None)
+    # Versi & tanggal terakhir per (ticker, kolom): satu tarikan massal
+    column_state = load_column_state(tickers if dirty_only else None)
+    # (ticker, calc_date) yang benar-benar ditulis -> dasar pembaruan inkremental agregat sektor
+    changed = []
+    print(f"🧠 [FEATURE ENGINEERING] Memulai rekayasa fitur {FEATURE_COLUMNS} untuk {total} emiten...")
 
     for i, ticker in enumerate(tickers):
         print(f"🔄 ({i+1}/{total}) Mengkalkulasi {ticker}...", end=" ")
-        
-        graham_number = get_graham_number(ticker)
-        time.sleep(0.2) 
-        
-        # PERUBAHAN KRITIS: Kita tarik H, L, C, dan Volume untuk menghitung MFI
-        res = supabase.table("daily_market_prices")\
-            .select("trade_date, high_price, low_price, adjusted_close, volume")\
-            .eq("ticker", ticker)\
-            .order("trade_date", desc=False)\
-            .limit(3000)\
-            .execute()
-            
-        if not res.data or len(res.data) < 30:
-            print("⚠️ Dilewati (Data tidak cukup)")
+
+        # Graham number di-refresh lebih dulu: jika riwayatnya berubah, kolom fundamental di-backfill penuh
+        funds = funda_store.frame([ticker])
+        force_full = set(FEATURE_COLUMNS) if ticker in dirty else set()
+        if ticker in funda_store.refreshed or ticker in funda_store.fallback:
+            force_full |= {col for col, ind in INDICATORS.items() if "fundamentals" in ind.inputs}
+        full, incremental = plan_columns(column_state.get(ticker, {}), force_full, rebuild)
+
+        try:
+            # Backfill penuh butuh seluruh riwayat; selain itu cukup ekor riwayat untuk pemanasan
+            since = None if full else _tail_start(incremental)
+            df = load_prices(ticker, price_inputs(INDICATORS.values()), since)
+        except Exception as e:
+            print(f"❌ Gagal tarik harga setelah 3 percobaan: {e}")
             continue
-            
-        df = pd.DataFrame(res.data)
-        
-        # Konversi ke numerik paksa
-        for col in ['high_price', 'low_price', 'adjusted_close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # KALKULASI MATEMATIKA (pandas_ta)
-        df.ta.rsi(close='adjusted_close', length=14, append=True)
-        df.ta.macd(close='adjusted_close', fast=12, slow=26, signal=9, append=True)
-        
-        # INJEKSI PILAR KE-3: Money Flow Index (MFI 14)
-        df.ta.mfi(high='high_price', low='low_price', close='adjusted_close', volume='volume', length=14, append=True)
-        
-        def calculate_mos(price, g_num):
-            if g_num <= 0 or price <= 0: return 0
-            return ((g_num - price) / g_num) * 100
-            
-        df['margin_of_safety'] = df['adjusted_close'].apply(lambda x: calculate_mos(x, graham_number))
-        
-        # Buang baris pemanasan yang menghasilkan NaN
-        df.dropna(subset=['RSI_14', 'MACD_12_26_9', 'MFI_14'], inplace=True)
-        
-        if df.empty:
-            print("⚠️ Dilewati (Data kosong)")
+
+        if df.empty or (full and len(df) < 30):
+            print("⚠️ Dilewati (Data tidak cukup)")
             continue
 
-        updates = []
-        for _, row in df.iterrows():
-            updates.append({
-                "ticker": ticker,
-                "calc_date": row['trade_date'],
-                "rsi_14": float(row['RSI_14']),
-                "macd": float(row['MACD_12_26_9']),
-                "margin_of_safety": float(row['margin_of_safety']),
-                "mfi_14": float(row['MFI_14']) # Data Volume Masuk!
-            })
-            
+        df['ticker'] = ticker
+
+        # KALKULASI PER KOLOM, tapi hanya tanggal yang SELURUH fitur model-nya sudah lewat pemanasan yang ditulis
+        # (tanpa ini margin_of_safety, warmup 0, membuat baris dengan rsi/macd/mfi NULL di awal riwayat)
+        ctx = {"ticker": ticker, "fundamentals": funds, "fundamentals_fallback": ticker in funda_store.fallback}
+        values = {col: INDICATORS[col].compute(df, ctx) for col in FEATURE_COLUMNS}
+        complete = complete_rows(values)
+        by_date = {}
+        last_dates = {}
+        sent_rows = {}
+        total_values = 0
+        for col in FEATURE_COLUMNS:
+            # Kolom nullable ditulis NULL pada tanggal lengkap (menimpa nilai lama, mis. MOS 0 dari fallback)
+            mask = complete if INDICATORS[col].nullable else values[col].notna() & complete
+            if col in incremental and col not in full:
+                # Jendela revisi ikut dihitung ulang: harga yang direvisi di sana mengubah nilai indikator
+                mask &= df['trade_date'] >= revisit_start(df['trade_date'], incremental[col])
+            if not mask.any():
+                continue
+
+            rows = [{"ticker": ticker, "calc_date": d, col: None if pd.isna(v) else float(v)}
+                    for d, v in zip(df['trade_date'][mask], values[col][mask])]
+            total_values += len(rows)
+            if col in full or rows[-1]['calc_date'] != incremental.get(col):
+                last_dates[col] = rows[-1]['calc_date']
+
+            if prime:
+                suppressors[col].prime(ticker)
+            sent_rows[col] = suppressors[col].filter(rows)
+            for r in sent_rows[col]:
+                by_date.setdefault(r['calc_date'], {"ticker": ticker, "calc_date": r['calc_date']})[col] = r[col]
+
+        sent = sum(len(rows) for rows in sent_rows.values())
         try:
-            CHUNK_SIZE = 1000
-            for c in range(0, len(updates), CHUNK_SIZE):
-                chunk = updates[c:c+CHUNK_SIZE]
-                supabase.table("technical_features").upsert(chunk, on_conflict="ticker,calc_date").execute()
-            print(f"✅ Selesai ({len(updates)} baris)")
+            # PostgREST butuh kunci seragam per batch: kelompokkan baris menurut set kolom yang diisi
+            groups = {}
+            for row in by_date.values():
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            for rows in groups.values():
+                for c in range(0, len(rows), chunk_size):
+                    chunk = rows[c:c+chunk_size]
+                    # Retry untuk injeksi (Upsert): governor menurunkan laju saat Cloudflare/Supabase tersedak
+                    governed_call(lambda: supabase.table("technical_features")\
+                        .upsert(chunk, on_conflict="ticker,calc_date").execute(), supabase_governor)
+                    changed.extend((r['ticker'], r['calc_date']) for r in chunk)
+
+            for col, rows in sent_rows.items():
+                suppressors[col].commit(rows)
+            save_column_state(ticker, last_dates)
+            if ticker in dirty:
+                clear_dirty([ticker])
         except Exception as e:
-            print(f"❌ Gagal Upsert: {e}")
+            print(f"❌ Gagal Upsert Final: {e}")
+            continue
+
+        mode = f"backfill {', '.join(full)}" if full else "inkremental"
+        if sent:
+            print(f"✅ Selesai [{mode}] ({sent} nilai dikirim, {total_values - sent} ditekan)")
+        else:
+            print(f"🧊 Tidak berubah [{mode}] ({total_values} nilai ditekan)")
+
+    print(f"\n📶 {get_governor('invezgo').summary()}\n📶 {supabase_governor.summary()}")
+    for suppressor in suppressors.values():
+        print(f"🧊 {suppressor.summary()}")
+    print(f"📚 {funda_store.summary()}")
+
+    try:
+        refresh_aggregates(changed)
+    except Exception as e:
+        print(f"❌ Gagal memperbarui agregat sektor: {e}")
+
+    print("\n🎉 REKAYASA FITUR SELESAI.")
 
-    print("\n🎉 REKAYASA FITUR (3 PILAR) SELESAI.")
+def main(description="Rekayasa fitur teknikal + margin of safety", chunk_size=1000):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--no-suppress", action="store_true", help="Kirim semua baris tanpa cek hash konten")
+    parser.add_argument("--prime-hashes", action="store_true", help="Bangun ulang cache hash dari database (mesin baru / baris diubah di luar worker)")
+    parser.add_argument("--dirty-only", action="store_true", help="Hanya hitung ulang ticker di feature_recompute_queue")
+    parser.add_argument("--rebuild", nargs="+", default=[], choices=FEATURE_COLUMNS, metavar="COLUMN",
+                        help=f"Backfill ulang seluruh riwayat kolom tertentu ({', '.join(FEATURE_COLUMNS)})")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size, help="Baris per upsert")
+    args = parser.parse_args()
+    engineer_features(suppress=not args.no_suppress, prime=args.prime_hashes, dirty_only=args.dirty_only,
+                      rebuild=args.rebuild, chunk_size=args.chunk_size)
 
 if __name__ == "__main__":
-    engineer_features()
\ No newline at end of file
+    main()
@@ -1,8 +1,10 @@
-import time
-import yfinance as yf
 import pandas as pd
-from datetime import datetime
 from utils import supabase, get_all_tickers
+from rate_governor import get_governor, governed_call, governed_download
+from corporate_actions import fetch_stored_window, detect_adjustment_factor, readjust_history
+from feature_queue import mark_dirty
+from seed_historical import frame_to_rows, ticker_frame, PRICE_COLUMNS
+from write_suppression import WriteSuppressor
 
 def update_market_yfinance():
     tickers = get_all_tickers()
@@ -11,7 +13,13 @@ def update_market_yfinance():
 
     # Turunkan batch size untuk stabilitas
     BATCH_SIZE = 10 
-    today_str = datetime.now().strftime('%Y-%m-%d')
+    yahoo_governor = get_governor("yahoo")
+    supabase_governor = get_governor("supabase")
+    # Jaga cache hash seed_historical tetap sinkron dengan baris yang ditulis ulang di sini
+    suppressor = WriteSuppressor("daily_market_prices", "trade_date", PRICE_COLUMNS)
+    readjusted = []
+    dirty_failed = []
+    readjust_failed = []
     
     for i in range(0, total, BATCH_SIZE):
         batch_tickers = tickers[i:i+BATCH_SIZE]
@@ -22,41 +30,75 @@ def update_market_yfinance():
         try:
             # PERUBAHAN KRITIS: Hapus parameter session=session. 
             # Biarkan yfinance menggunakan curl_cffi internal mereka.
-            data = yf.download(
-                yf_symbols, 
-                period="5d", 
-                group_by='ticker', 
-                progress=False, 
-                threads=False, 
-                auto_adjust=False 
+            data = governed_download(
+                yf_symbols,
+                yahoo_governor,
+                period="5d",
+                group_by='ticker',
+                progress=False,
+                threads=False,
+                auto_adjust=False
             )
+
+            # Frame kosong (throttle / seluruh batch suspensi): tidak ada yang dibandingkan maupun ditulis
+            if data.empty:
+                print("⚠️ Tidak ada pembaruan (Data kosong/Suspensi).")
+                continue
+
+            # 0. SATU QUERY UNTUK SELURUH BATCH: Baris tersimpan di jendela 5 hari (override + faktor penyesuaian)
+            stored = fetch_stored_window(batch_tickers, data.index.min().strftime('%Y-%m-%d'))
             
             updates = []
             for ticker in batch_tickers:
                 symbol = f"{ticker}.JK"
                 try:
                     # Parsing hasil multi-index YFinance
-                    if len(batch_tickers) > 1:
-                        if symbol not in data.columns.levels[0]: continue
-                        stock_data = data[symbol].dropna(subset=['Close'])
-                    else:
-                        stock_data = data.dropna(subset=['Close'])
-                        
-                    if stock_data.empty: continue
+                    stock_data = ticker_frame(data, symbol)
+                    if stock_data is None or stock_data.empty: continue
                         
                     last_row = stock_data.iloc[-1]
                     trade_date = stock_data.index[-1].strftime('%Y-%m-%d')
                     
-                    # 1. CEK SABUK PENGAMAN ADMIN
-                    existing_db = supabase.table("daily_market_prices")\
-                        .select("is_manually_overridden")\
-                        .eq("ticker", ticker).eq("trade_date", trade_date).execute()
-                    
-                    if existing_db.data and existing_db.data[0].get("is_manually_overridden") == True:
+                    stored_rows = stored.get(ticker, {})
+
+                    # 1. DETEKSI AKSI KORPORASI (Split/Dividen): Yahoo mengubah Adj Close seluruh riwayat
+                    factor, window_date = detect_adjustment_factor(stock_data, stored_rows)
+                    if factor:
+                        # Baris di dalam jendela ditulis ulang dengan nilai segar (kecuali yang dikunci admin)
+                        # LEBIH DULU: begitu tersimpan, rasio segar/tersimpan kembali 1 sehingga faktor yang sama
+                        # tidak terdeteksi (dan dikalikan) lagi pada run berikutnya walau langkah setelahnya gagal.
+                        window_rows = [r for r in frame_to_rows(ticker, stock_data)
+                                       if r['trade_date'] != trade_date
+                                       and not stored_rows.get(r['trade_date'], {}).get("is_manually_overridden")]
+                        if window_rows:
+                            governed_call(lambda: supabase.table("daily_market_prices")
+                                          .upsert(window_rows, on_conflict="ticker,trade_date").execute(),
+                                          supabase_governor)
+                            suppressor.commit(window_rows)
+
+                        try:
+                            n_rows = readjust_history(ticker, factor, window_date, suppressor)
+                            print(f"\n   🔧 [AKSI KORPORASI] {ticker}: faktor {factor:.4f}, {n_rows} baris riwayat disesuaikan ulang.")
+                        except Exception as e:
+                            # Jendela sudah segar -> faktor ini tidak akan terdeteksi ulang: wajib ditangani manual
+                            print(f"\n   ❌ [AKSI KORPORASI] {ticker}: gagal menyesuaikan riwayat (faktor {factor:.6f} "
+                                  f"sebelum {window_date}): {e}")
+                            readjust_failed.append(ticker)
+                        readjusted.append(ticker)
+
+                        # Antrian recompute fitur: kegagalannya tidak boleh membuang baris harga hari ini
+                        try:
+                            mark_dirty(ticker, f"adjustment factor {factor:.6f} sejak {window_date}")
+                        except Exception as e:
+                            print(f"\n   ⚠️ {ticker} gagal masuk antrian recompute fitur: {e}")
+                            dirty_failed.append(ticker)
+
+                    # 2. CEK SABUK PENGAMAN ADMIN
+                    if stored_rows.get(trade_date, {}).get("is_manually_overridden") == True:
                         print(f"\n   🛡️ [OVERRIDE BLOCK] {ticker} dilewati. Data dikunci.")
                         continue 
                     
-                    # 2. PERSIAPKAN PAYLOAD
+                    # 3. PERSIAPKAN PAYLOAD
                     updates.append({
                         "ticker": ticker,
                         "trade_date": trade_date,
@@ -69,11 +111,14 @@ def update_market_yfinance():
                     })
                     
                 except Exception as e:
+                    print(f"\n   ❌ {ticker} dilewati: {e}")
                     continue
 
-            # 3. EKSEKUSI UPSERT KE DATABASE
+            # 4. EKSEKUSI UPSERT KE DATABASE
             if updates:
-                supabase.table("daily_market_prices").upsert(updates, on_conflict="ticker,trade_date").execute()
+                governed_call(lambda: supabase.table("daily_market_prices")
+                              .upsert(updates, on_conflict="ticker,trade_date").execute(), supabase_governor)
+                suppressor.commit(updates)
                 print(f"✅ {len(updates)} baris disuntikkan ke Data Lake.")
             else:
                 print("⚠️ Tidak ada pembaruan (Data kosong/Suspensi).")
@@ -81,8 +126,13 @@ def update_market_yfinance():
         except Exception as e:
             print(f"❌ Error Eksekusi: {e}")
 
-        time.sleep(3) # Jeda sopan santun mutlak
-
+    print(f"\n📶 {yahoo_governor.summary()}\n📶 {supabase_governor.summary()}")
+    if readjusted:
+        print(f"🔧 {len(readjusted)} emiten disesuaikan ulang & ditandai dirty: {', '.join(readjusted)}")
+    if readjust_failed:
+        print(f"❌ Riwayat GAGAL disesuaikan ulang (perlu seed_historical ulang): {', '.join(readjust_failed)}")
+    if dirty_failed:
+        print(f"⚠️ Gagal masuk feature_recompute_queue (jalankan features --rebuild untuk emiten ini): {', '.join(dirty_failed)}")
     print("\n🎉 AKUISISI DATA LAKE SELESAI!")
 
 if __name__ == "__main__":
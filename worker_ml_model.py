@@ -1,99 +1,163 @@
 import os
+import argparse
+import hashlib
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.impute import SimpleImputer
-from sklearn.metrics import precision_score, recall_score, f1_score, confusion_matrix
 # SMOTE DIHAPUS: Haram digunakan pada data Time-Series finansial
+# sklearn & joblib dimuat di dalam fungsi agar `--help` dan import modul tetap cepat
 from dotenv import load_dotenv
-from utils import supabase, get_all_tickers
+from utils import supabase, get_all_tickers, fetch_all_rows
+from model_store import save_model, grade_from_proba, A_THRESHOLD
+from sector_aggregates import refresh_aggregates
+from indicators import model_features
+from memory_budget import parse_size, ChunkPlanner, StageTracker, iter_chunks, downcast_frame
 import warnings
 
 warnings.filterwarnings('ignore')
 load_dotenv()
 
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", "eval_cache")
+N_SPLITS = 3
+# Horizon label T+20: baris latih dalam 20 hari sebelum fold uji memakai harga di dalam fold uji,
+# jadi TimeSeriesSplit diberi gap sebesar horizon agar evaluasi tidak optimis
+LABEL_HORIZON = 20
+
+# Fitur teknikal dibaca dari registry indikator; rasio fundamental dari financial_reports
+TECH_FEATURES = model_features()
+FUNDAMENTAL_RATIOS = ['per', 'pbv', 'roa', 'roe']
+FEATURES = TECH_FEATURES + FUNDAMENTAL_RATIOS
+
+def time_splits(n_rows, n_splits=N_SPLITS):
+    """Fold TimeSeriesSplit dengan gap LABEL_HORIZON; [] jika riwayat terlalu pendek untuk gap tersebut."""
+    from sklearn.model_selection import TimeSeriesSplit
+
+    try:
+        return list(TimeSeriesSplit(n_splits=n_splits, gap=LABEL_HORIZON).split(np.zeros((n_rows, 1))))
+    except ValueError:
+        return []
+
+def ticker_features(train_data):
+    """
+    Fitur yang dipakai model satu emiten: kolom yang seluruhnya NULL dibuang (mis. margin_of_safety emiten
+    yang fundamentalnya tanpa tanggal periode), bukan diimputasi dari nilai yang tidak pernah ada saat latih.
+    """
+    return [f for f in FEATURES if train_data[f].notna().any()]
+
+def build_forest():
+    from sklearn.ensemble import RandomForestClassifier
+
+    return RandomForestClassifier(
+        n_estimators=100, 
+        max_depth=10, 
+        random_state=42, 
+        class_weight='balanced',
+        min_samples_leaf=5 # Mencegah overfitting pada noise pasar
+    )
+
+def load_training_frame(ticker):
+    """
+    Menyusun data latih (fitur + target_grade T+20) dan baris fitur hari ini untuk satu emiten.
+    Mengembalikan (train_data, today_data, alasan_skip).
+    """
+    # 1. TARIK DATA TEKNIKAL & MOS
+    res_feat = supabase.table("technical_features")\
+        .select(", ".join(["calc_date"] + TECH_FEATURES))\
+        .eq("ticker", ticker).order("calc_date", desc=False).execute()
+        
+    # 2. TARIK DATA HARGA
+    res_price = supabase.table("daily_market_prices")\
+        .select("trade_date, adjusted_close")\
+        .eq("ticker", ticker).order("trade_date", desc=False).execute()
+
+    # 3. TARIK DATA FUNDAMENTAL
+    res_fund = supabase.table("financial_reports")\
+        .select("period_date, per, pbv, roa, roe")\
+        .eq("ticker", ticker).order("period_date", desc=False).execute()
+
+    if not res_feat.data or not res_price.data or len(res_feat.data) < 50:
+        return None, None, "Data < 50 baris"
+
+    df_feat = pd.DataFrame(res_feat.data).rename(columns={"calc_date": "date"})
+    df_price = pd.DataFrame(res_price.data).rename(columns={"trade_date": "date"})
+    
+    df = pd.merge(df_feat, df_price, on="date", how="inner")
+    df['date'] = pd.to_datetime(df['date'])
+    df['adjusted_close'] = pd.to_numeric(df['adjusted_close'])
+    
+    # FUSI DATA FUNDAMENTAL (Logika Forward Fill)
+    if res_fund.data:
+        df_fund = pd.DataFrame(res_fund.data).rename(columns={"period_date": "date"})
+        df_fund['date'] = pd.to_datetime(df_fund['date'])
+        df = pd.merge_asof(df.sort_values('date'), df_fund.sort_values('date'), on='date', direction='backward')
+    
+    # [PERBAIKAN FATAL] PENYEMBUHAN NAN TANPA DATA LEAKAGE
+    # Urutkan berdasarkan waktu, lalu FFILL (Bawa data masa lalu ke depan). Jangan pernah BFILL.
+    df.sort_values('date', inplace=True)
+    fallback_ratios = {'per': 15.0, 'pbv': 1.5, 'roa': 5.0, 'roe': 10.0}
+    
+    for col, val in fallback_ratios.items():
+        if col not in df.columns:
+            df[col] = val
+        else:
+            df[col] = df[col].ffill().fillna(val)
+
+    if df.empty:
+        return None, None, "Data kosong"
+    
+    # 4. HORIZON PREDIKSI SEBULAN (T+20)
+    df['future_price_20d'] = df['adjusted_close'].shift(-LABEL_HORIZON)
+    
+    def assign_grade(row):
+        if pd.isna(row['future_price_20d']): return None
+        ret = ((row['future_price_20d'] - row['adjusted_close']) / row['adjusted_close']) * 100
+        
+        if ret >= 8.0: return 'A'
+        elif ret <= -4.0: return 'C'
+        else: return 'B'
+        
+    df['target_grade'] = df.apply(assign_grade, axis=1)
+
+    # float32 HANYA untuk kolom fitur (separuh memori, RandomForest memang bekerja di float32), SETELAH label
+    # dihitung dari adjusted_close float64: pembulatan float32 bisa membalik grade di sekitar batas +8% / -4%
+    df[FEATURES] = downcast_frame(df[FEATURES].copy())
+    
+    # 5. PEMISAHAN DATA
+    today_data = df.iloc[-1:] 
+    train_data = df.dropna(subset=['target_grade']) 
+    
+    if len(train_data) < 30:
+        return None, None, "Data latih kurang dari 30 hari EOD"
+
+    return train_data, today_data, None
+
 def train_and_predict():
+    from sklearn.impute import SimpleImputer
+    from sklearn.metrics import precision_score, recall_score, f1_score, confusion_matrix
+
     tickers = get_all_tickers()
     total = len(tickers)
     print(f"🧠 [ML ENGINE ADVANCED] Memulai Pipeline T+20, Fusi Fundamental (No Leakage) untuk {total} emiten...")
     
     today_str = datetime.now().strftime('%Y-%m-%d')
+    tracker = StageTracker()
     all_y_true = []
     all_y_pred = []
+    # (ticker, tanggal fitur) yang grade-nya baru ditulis -> agregat sektor diperbarui inkremental
+    changed = []
 
     for i, ticker in enumerate(tickers):
         print(f"🤖 ({i+1}/{total}) Fitting Model: {ticker}...", end=" ")
         
         try:
-            # 1. TARIK DATA TEKNIKAL & MOS
-            res_feat = supabase.table("technical_features")\
-                .select("calc_date, rsi_14, macd, margin_of_safety, mfi_14")\
-                .eq("ticker", ticker).order("calc_date", desc=False).execute()
-                
-            # 2. TARIK DATA HARGA
-            res_price = supabase.table("daily_market_prices")\
-                .select("trade_date, adjusted_close")\
-                .eq("ticker", ticker).order("trade_date", desc=False).execute()
-
-            # 3. TARIK DATA FUNDAMENTAL
-            res_fund = supabase.table("financial_reports")\
-                .select("period_date, per, pbv, roa, roe")\
-                .eq("ticker", ticker).order("period_date", desc=False).execute()
-
-            if not res_feat.data or not res_price.data or len(res_feat.data) < 50:
-                print("⚠️ Skip (Data < 50 baris)")
+            # 1-5. TARIK DATA, FUSI FUNDAMENTAL & LABEL T+20
+            with tracker.stage("load"):
+                train_data, today_data, skip_reason = load_training_frame(ticker)
+            if skip_reason:
+                print(f"⚠️ Skip ({skip_reason})")
                 continue
 
-            df_feat = pd.DataFrame(res_feat.data).rename(columns={"calc_date": "date"})
-            df_price = pd.DataFrame(res_price.data).rename(columns={"trade_date": "date"})
-            
-            df = pd.merge(df_feat, df_price, on="date", how="inner")
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # FUSI DATA FUNDAMENTAL (Logika Forward Fill)
-            if res_fund.data:
-                df_fund = pd.DataFrame(res_fund.data).rename(columns={"period_date": "date"})
-                df_fund['date'] = pd.to_datetime(df_fund['date'])
-                df = pd.merge_asof(df.sort_values('date'), df_fund.sort_values('date'), on='date', direction='backward')
-            
-            # [PERBAIKAN FATAL] PENYEMBUHAN NAN TANPA DATA LEAKAGE
-            # Urutkan berdasarkan waktu, lalu FFILL (Bawa data masa lalu ke depan). Jangan pernah BFILL.
-            df.sort_values('date', inplace=True)
-            fallback_ratios = {'per': 15.0, 'pbv': 1.5, 'roa': 5.0, 'roe': 10.0}
-            
-            for col, val in fallback_ratios.items():
-                if col not in df.columns:
-                    df[col] = val
-                else:
-                    df[col] = df[col].ffill().fillna(val)
-
-            if df.empty: continue
-            
-            # 4. HORIZON PREDIKSI SEBULAN (T+20)
-            df['adjusted_close'] = pd.to_numeric(df['adjusted_close'])
-            df['future_price_20d'] = df['adjusted_close'].shift(-20)
-            
-            def assign_grade(row):
-                if pd.isna(row['future_price_20d']): return None
-                ret = ((row['future_price_20d'] - row['adjusted_close']) / row['adjusted_close']) * 100
-                
-                if ret >= 8.0: return 'A'
-                elif ret <= -4.0: return 'C'
-                else: return 'B'
-                
-            df['target_grade'] = df.apply(assign_grade, axis=1)
-            
-            # 5. PEMISAHAN DATA
-            today_data = df.iloc[-1:] 
-            train_data = df.dropna(subset=['target_grade']) 
-            
-            if len(train_data) < 30:
-                print("⚠️ Skip (Data latih kurang dari 30 hari EOD)")
-                continue
-                
-            features = ['rsi_14', 'macd', 'margin_of_safety', 'mfi_14', 'per', 'pbv', 'roa', 'roe']
+            features = ticker_features(train_data)
             X_raw = train_data[features]
             Y = train_data['target_grade']
             X_today_raw = today_data[features]
@@ -103,71 +167,34 @@ def train_and_predict():
             X_imputed = pd.DataFrame(imputer.fit_transform(X_raw), columns=features)
             X_today = pd.DataFrame(imputer.transform(X_today_raw), columns=features)
 
-            # 7. PEMBAGIAN TRAIN & TEST UNTUK EVALUASI
-            tscv = TimeSeriesSplit(n_splits=3)
-            splits = list(tscv.split(X_imputed))
-            train_idx, test_idx = splits[-1]
-            
-            X_train_eval, X_test_eval = X_imputed.iloc[train_idx], X_imputed.iloc[test_idx]
-            Y_train_eval, Y_test_eval = Y.iloc[train_idx], Y.iloc[test_idx]
-            
-            # 8. PELATIHAN & EVALUASI OOB (TANPA SMOTE)
-            rf_eval = RandomForestClassifier(
-                n_estimators=100, 
-                max_depth=10, 
-                random_state=42, 
-                class_weight='balanced',
-                min_samples_leaf=5 # Mencegah overfitting pada noise pasar
-            )
-            rf_eval.fit(X_train_eval, Y_train_eval)
-            
-            # Simulasikan Threshold 65% pada data evaluasi
-            eval_proba = rf_eval.predict_proba(X_test_eval)
-            classes_eval = rf_eval.classes_
-            Y_pred_eval = []
-            
-            for prob in eval_proba:
-                if 'A' in classes_eval:
-                    idx_A = list(classes_eval).index('A')
-                    if prob[idx_A] >= 0.65:
-                        Y_pred_eval.append('A')
-                    else:
-                        temp_prob = prob.copy()
-                        temp_prob[idx_A] = -1
-                        Y_pred_eval.append(classes_eval[np.argmax(temp_prob)])
-                else:
-                    Y_pred_eval.append(classes_eval[np.argmax(prob)])
-
-            all_y_true.extend(Y_test_eval.tolist())
-            all_y_pred.extend(Y_pred_eval)
+            # 7. PEMBAGIAN TRAIN & TEST UNTUK EVALUASI (gap = horizon label, riwayat pendek -> evaluasi dilewati)
+            splits = time_splits(len(X_imputed), 3)
+            if splits:
+                train_idx, test_idx = splits[-1]
+
+                X_train_eval, X_test_eval = X_imputed.iloc[train_idx], X_imputed.iloc[test_idx]
+                Y_train_eval, Y_test_eval = Y.iloc[train_idx], Y.iloc[test_idx]
+
+                # 8. PELATIHAN & EVALUASI OOB (TANPA SMOTE)
+                rf_eval = build_forest()
+                with tracker.stage("fit_eval"):
+                    rf_eval.fit(X_train_eval, Y_train_eval)
+
+                # Simulasikan Threshold 65% pada data evaluasi
+                Y_pred_eval, _ = grade_from_proba(rf_eval.predict_proba(X_test_eval), rf_eval.classes_)
+
+                all_y_true.extend(Y_test_eval.tolist())
+                all_y_pred.extend(Y_pred_eval.tolist())
             
             # 9. PELATIHAN MODEL FINAL
-            rf_final = RandomForestClassifier(
-                n_estimators=100, 
-                max_depth=10, 
-                random_state=42, 
-                class_weight='balanced',
-                min_samples_leaf=5
-            )
-            rf_final.fit(X_imputed, Y)
+            rf_final = build_forest()
+            with tracker.stage("fit_final"):
+                rf_final.fit(X_imputed, Y)
             
             # 10. PREDIKSI HARI INI DENGAN THRESHOLD KETAT (65%)
-            today_proba = rf_final.predict_proba(X_today)[0]
-            classes_final = rf_final.classes_
-            
-            if 'A' in classes_final:
-                idx_A = list(classes_final).index('A')
-                prob_A = today_proba[idx_A]
-                
-                if prob_A >= 0.65:
-                    prediction = 'A'
-                else:
-                    # Tolak Buy jika tidak yakin. Paksa jadi Hold (B) atau Cutloss (C)
-                    temp_proba = today_proba.copy()
-                    temp_proba[idx_A] = -1
-                    prediction = classes_final[np.argmax(temp_proba)]
-            else:
-                prediction = classes_final[np.argmax(today_proba)]
+            # Tolak Buy jika tidak yakin. Paksa jadi Hold (B) atau Cutloss (C)
+            grades, probs_A = grade_from_proba(rf_final.predict_proba(X_today), rf_final.classes_)
+            prediction, prob_A = str(grades[0]), probs_A[0]
 
             importances = rf_final.feature_importances_
             feat_imp_dict = {feat: round(float(imp), 4) for feat, imp in zip(features, importances)}
@@ -180,15 +207,25 @@ def train_and_predict():
                 "feature_importance": feat_imp_dict
             }
             supabase.table("ml_predictions").upsert(payload, on_conflict="ticker,prediction_date").execute()
+            feature_date = today_data['date'].iloc[0].strftime('%Y-%m-%d')
+            changed.append((ticker, feature_date))
             
-            print(f"✅ Grade: {prediction} (Prob A: {prob_A:.2f})" if 'A' in classes_final else f"✅ Grade: {prediction}")
+            # 11b. SIMPAN MODEL UNTUK INFERENSI ON-DEMAND (POST /api/predict)
+            save_model(ticker, {
+                "ticker": ticker,
+                "model": rf_final,
+                "imputer": imputer,
+                "features": features,
+                "latest_row": X_today_raw.iloc[0].to_dict(),
+                "feature_date": feature_date,
+                "prediction_date": today_str
+            })
+
+            print(f"✅ Grade: {prediction} (Prob A: {prob_A:.2f})" if not np.isnan(prob_A) else f"✅ Grade: {prediction}")
 
         except Exception as e:
             print(f"❌ Error: {e}")
-            
-        import time
-        time.sleep(0.1)
-            
+
     # =========================================================================
     # FASE 12: EVALUASI GLOBAL UNTUK DASHBOARD "MODEL HEALTH"
     # =========================================================================
@@ -220,7 +257,230 @@ def train_and_predict():
         supabase.table("model_metrics").insert(metrics_payload).execute()
         print(f"✅ Presisi Realistis: {round(prec, 2)}% | False Positive: {fp}")
 
+    try:
+        refresh_aggregates(changed)
+    except Exception as e:
+        print(f"❌ Gagal memperbarui agregat sektor: {e}")
+
+    tracker.report()
     print("\n🎉 SELURUH PIPELINE SELESAI!")
 
+# =========================================================================
+# MODE EVALUASI: SELURUH FOLD PARALEL + CACHE PROBABILITAS + SAPUAN THRESHOLD
+# =========================================================================
+def _fit_fold(ticker, X_raw, Y, train_idx, test_idx):
+    from sklearn.impute import SimpleImputer
+
+    # Imputer di-fit HANYA pada fold latih agar median masa depan tidak bocor ke fold uji
+    imputer = SimpleImputer(strategy='median')
+    X_train = pd.DataFrame(imputer.fit_transform(X_raw.iloc[train_idx]), columns=X_raw.columns)
+    X_test = pd.DataFrame(imputer.transform(X_raw.iloc[test_idx]), columns=X_raw.columns)
+
+    rf = build_forest()
+    rf.fit(X_train, Y.iloc[train_idx])
+
+    # Samakan kolom probabilitas ke urutan A, B, C (kelas yang tidak muncul = 0)
+    proba = np.zeros((len(test_idx), 3))
+    fold_proba = rf.predict_proba(X_test)
+    for j, cls in enumerate(rf.classes_):
+        proba[:, "ABC".index(cls)] = fold_proba[:, j]
+    return ticker, test_idx, proba
+
+def _cache_path(ticker):
+    return os.path.join(EVAL_CACHE_DIR, f"{ticker}.npz")
+
+def _is_cache_fresh(ticker, train_data):
+    path = _cache_path(ticker)
+    if not os.path.exists(path):
+        return False
+    with np.load(path, allow_pickle=False) as cached:
+        return str(cached['fingerprint']) == _fingerprint(train_data)
+
+def _fingerprint(train_data):
+    # Hash ISI X/Y (bukan sekadar jumlah baris/tanggal): penyesuaian ulang adjusted_close (aksi korporasi)
+    # atau backfill kolom indikator mengubah nilai tanpa mengubah panjang data -> cache lama harus batal
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{','.join(FEATURES)}|gap={LABEL_HORIZON}|splits={N_SPLITS}".encode())
+    frame = train_data[['date'] + FEATURES + ['target_grade']].reset_index(drop=True)
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def build_oof_cache(tickers, n_jobs=-1, max_memory=None, tracker=None):
+    """
+    Fit SELURUH fold TimeSeriesSplit secara paralel lalu simpan probabilitas out-of-fold per emiten
+    ke EVAL_CACHE_DIR. Emiten yang datanya tidak berubah sejak cache terakhir tidak di-fit ulang.
+    Dengan max_memory, jumlah emiten per batch disesuaikan dengan anggaran RAM.
+    """
+    from joblib import Parallel, delayed
+
+    os.makedirs(EVAL_CACHE_DIR, exist_ok=True)
+    planner = ChunkPlanner(parse_size(max_memory), initial=16, maximum=64)
+    tracker = tracker or StageTracker()
+    total = len(tickers)
+    fitted = reused = done = 0
+
+    for batch in iter_chunks(tickers, planner):
+        tasks, frames = [], {}
+
+        # I/O serial (Supabase), lalu CPU paralel (seluruh fold dalam satu batch sekaligus)
+        for ticker in batch:
+            try:
+                with tracker.stage("load"):
+                    train_data, _, skip_reason = load_training_frame(ticker)
+            except Exception as e:
+                print(f"   ❌ {ticker}: {e}")
+                continue
+            if skip_reason:
+                continue
+            if _is_cache_fresh(ticker, train_data):
+                reused += 1
+                continue
+
+            X_raw = train_data[ticker_features(train_data)].reset_index(drop=True)
+            Y = train_data['target_grade'].reset_index(drop=True)
+            splits = time_splits(len(X_raw))
+            if not splits:
+                continue
+            frames[ticker] = train_data
+            for train_idx, test_idx in splits:
+                tasks.append(delayed(_fit_fold)(ticker, X_raw, Y, train_idx, test_idx))
+
+        with tracker.stage("fit_folds"):
+            results = Parallel(n_jobs=n_jobs)(tasks) if tasks else []
+
+        by_ticker = {}
+        for ticker, test_idx, proba in results:
+            by_ticker.setdefault(ticker, []).append((test_idx, proba))
+
+        for ticker, folds in by_ticker.items():
+            train_data = frames[ticker]
+            idx = np.concatenate([f[0] for f in folds])
+            np.savez_compressed(
+                _cache_path(ticker),
+                dates=train_data['date'].dt.strftime('%Y-%m-%d').to_numpy()[idx].astype('U10'),
+                y_true=train_data['target_grade'].to_numpy()[idx].astype('U1'),
+                proba=np.vstack([f[1] for f in folds]),
+                fingerprint=np.array(_fingerprint(train_data))
+            )
+            fitted += 1
+
+        done += len(batch)
+        print(f"   🧪 ({done}/{total}) Fit baru: {fitted} | Cache dipakai: {reused}", end="\r")
+
+    print(f"\n✅ Cache out-of-fold siap ({fitted} di-fit, {reused} dari cache).")
+
+def load_oof_cache(sector_map):
+    tickers, sectors, dates, y_true, proba = [], [], [], [], []
+    for name in sorted(os.listdir(EVAL_CACHE_DIR)):
+        if not name.endswith(".npz"):
+            continue
+        ticker = name[:-4]
+        with np.load(os.path.join(EVAL_CACHE_DIR, name), allow_pickle=False) as cached:
+            n = len(cached['y_true'])
+            tickers.append(np.full(n, ticker))
+            sectors.append(np.full(n, sector_map.get(ticker) or "Unknown"))
+            dates.append(cached['dates'])
+            y_true.append(cached['y_true'])
+            proba.append(cached['proba'])
+
+    if not y_true:
+        return None
+    return {
+        "ticker": np.concatenate(tickers),
+        "sector": np.concatenate(sectors),
+        "date": np.concatenate(dates),
+        "y_true": np.concatenate(y_true),
+        "proba": np.vstack(proba),
+    }
+
+def sweep_thresholds(y_true, prob_A, groups, thresholds):
+    """
+    Presisi & recall kelas A untuk SEMUA threshold sekaligus (matriks threshold x baris),
+    global dan per grup (sektor). Tidak ada model yang di-fit ulang.
+    """
+    is_A = (y_true == 'A')
+    pred_A = prob_A[None, :] >= thresholds[:, None]
+
+    group_names, group_idx = np.unique(groups, return_inverse=True)
+    onehot = np.zeros((len(prob_A), len(group_names) + 1))
+    onehot[np.arange(len(prob_A)), group_idx] = 1
+    onehot[:, -1] = 1  # Kolom terakhir = agregat global
+
+    tp = (pred_A & is_A).astype(float) @ onehot
+    fp = (pred_A & ~is_A).astype(float) @ onehot
+    fn = (~pred_A & is_A).astype(float) @ onehot
+
+    precision = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0) * 100
+    recall = np.divide(tp, tp + fn, out=np.zeros_like(tp), where=(tp + fn) > 0) * 100
+
+    labels = list(group_names) + ["ALL"]
+    rows = []
+    for t, th in enumerate(thresholds):
+        for g, label in enumerate(labels):
+            rows.append({
+                "threshold": round(float(th), 2),
+                "sector": label,
+                "precision": round(float(precision[t, g]), 2),
+                "recall": round(float(recall[t, g]), 2),
+                "signals": int(tp[t, g] + fp[t, g]),
+                "support_A": int(tp[t, g] + fn[t, g]),
+            })
+    return pd.DataFrame(rows)
+
+def evaluate_models(thresholds, n_jobs=-1, sweep_only=False, export_signals=None, signal_threshold=A_THRESHOLD,
+                    max_memory=None):
+    print(f"🧪 [ML EVALUATION] Evaluasi seluruh {N_SPLITS} fold + sapuan threshold {thresholds[0]:.2f}-{thresholds[-1]:.2f}...")
+    tracker = StageTracker()
+
+    if not sweep_only:
+        build_oof_cache(get_all_tickers(), n_jobs=n_jobs, max_memory=max_memory, tracker=tracker)
+
+    if not os.path.isdir(EVAL_CACHE_DIR):
+        print("⚠️ Cache evaluasi kosong. Jalankan tanpa --sweep-only terlebih dahulu.")
+        return
+
+    sector_rows = fetch_all_rows(lambda: supabase.table("emitens").select("ticker, sector").order("ticker"))
+    oof = load_oof_cache({r['ticker']: r['sector'] for r in sector_rows})
+    if oof is None:
+        print("⚠️ Cache evaluasi kosong. Jalankan tanpa --sweep-only terlebih dahulu.")
+        return
+
+    with tracker.stage("sweep"):
+        report = sweep_thresholds(oof["y_true"], oof["proba"][:, 0], oof["sector"], thresholds)
+    report_path = os.path.join(EVAL_CACHE_DIR, "threshold_sweep.csv")
+    report.to_csv(report_path, index=False)
+
+    print(f"\n📊 Ringkasan Global ({len(oof['y_true'])} baris out-of-fold):")
+    print(report[report['sector'] == "ALL"].to_string(index=False))
+    print(f"\n💾 Rincian per sektor disimpan ke {report_path}")
+
+    # Re-prediksi walk-forward (out-of-fold) sebagai input backtest.py --signals
+    if export_signals:
+        grades, _ = grade_from_proba(oof["proba"], np.array(['A', 'B', 'C']), signal_threshold)
+        pd.DataFrame({"ticker": oof["ticker"], "date": oof["date"], "grade": grades})\
+            .to_csv(export_signals, index=False)
+        print(f"💾 Sinyal out-of-fold (threshold {signal_threshold}) disimpan ke {export_signals}")
+
+    tracker.report()
+    print("\n🎉 EVALUASI SELESAI!")
+
+def parse_thresholds(spec):
+    start, stop, step = (float(x) for x in spec.split(":"))
+    return np.round(np.arange(start, stop + step / 2, step), 4)
+
 if __name__ == "__main__":
-    train_and_predict()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Training & prediksi harian, atau evaluasi seluruh fold")
+    parser.add_argument("--evaluate", action="store_true", help="Mode evaluasi: seluruh fold + sapuan threshold")
+    parser.add_argument("--sweep-only", action="store_true", help="Sapu threshold dari cache tanpa fit ulang")
+    parser.add_argument("--thresholds", default="0.50:0.90:0.05", help="start:stop:step")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--export-signals", help="Simpan sinyal out-of-fold ke CSV (untuk backtest.py --signals)")
+    parser.add_argument("--max-memory", help="Anggaran RAM mode evaluasi, mis. 1GB (batch emiten adaptif). "
+                        "Tidak berlaku untuk training harian, yang memuat satu emiten per waktu")
+    args = parser.parse_args()
+
+    if args.evaluate or args.sweep_only:
+        evaluate_models(parse_thresholds(args.thresholds), args.n_jobs, args.sweep_only, args.export_signals,
+                        max_memory=args.max_memory)
+    else:
+        train_and_predict()
@@ -1,12 +1,4 @@
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
-
-# Muat environment variables
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from utils import supabase
 
 def check_price_alerts():
     print("🔍 [ALERT WORKER] Memulai pemindaian target harga...")
@@ -31,6 +23,7 @@ def check_price_alerts():
         target_price = alert['alert_threshold_price']
         user_id = alert['user_id']
         alert_id = alert['id']
+        direction = alert.get('alert_direction') or "above"
 
         # 2. Tarik harga TERAKHIR dari database market_prices kita
         price_res = supabase.table("daily_market_prices")\
@@ -46,8 +39,9 @@ def check_price_alerts():
             
             print(f"[{ticker}] Target: {target_price} | Harga Saat Ini ({trade_date}): {latest_price}")
 
-            # 3. LOGIKA TRIGGER: Take Profit (Harga Saat Ini >= Target)
-            if latest_price >= target_price:
+            # 3. LOGIKA TRIGGER: Take Profit (Harga >= Target) atau Stop Loss (Harga <= Target)
+            crossed = latest_price <= target_price if direction == "below" else latest_price >= target_price
+            if crossed:
                 print(f"   🚨 TRIGGERED! {ticker} telah menyentuh target {target_price}!")
                 
                 # UPDATE DATABASE UNTUK MEMICU SUPABASE REALTIME DI FRONTEND
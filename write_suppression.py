@@ -0,0 +1,186 @@
+"""
+Penekan tulis berbasis hash konten untuk daily_market_prices & technical_features.
+
+Store hash ini LOKAL (SQLite per mesin) dan hanya tahu apa yang ditulis oleh worker di mesin ini.
+Perubahan baris di database dari luar (override/koreksi admin, perbaikan manual, run dari mesin lain)
+tidak terlihat: baris yang nilainya dihitung sama dengan hash lama tidak akan dikirim ulang.
+Jalur pemulihan:
+- --prime-hashes (seed_historical / features): bangun ulang hash ticker dari isi database saat ini
+- --no-suppress: kirim semua baris tanpa cek hash (sekali jalan)
+- `python cli.py write-cache --clear [--namespace ...] [--tickers ...]`: buang hash lokal
+- WRITE_CACHE_TTL_DAYS: hash lebih tua dari N hari diabaikan, jadi setiap baris dikirim ulang paling lambat
+  setelah N hari (0 = tanpa kedaluwarsa)
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import argparse
+from collections import OrderedDict
+from utils import supabase, fetch_all_rows
+
+# Hash konten per (tabel, ticker, tanggal) disimpan lokal (SQLite, 8 byte per baris)
+WRITE_CACHE_PATH = os.getenv("WRITE_CACHE_PATH", os.path.join(".write_cache", "hashes.sqlite"))
+WRITE_CACHE_TTL_DAYS = float(os.getenv("WRITE_CACHE_TTL_DAYS", "30"))
+# Jumlah ticker yang hash-nya ditahan di RAM sekaligus (sisanya tetap di SQLite)
+KNOWN_TICKERS_IN_MEMORY = 64
+
+def _canonical(value):
+    if value is None:
+        return "N"
+    if isinstance(value, float):
+        # 10 digit signifikan: stabil terhadap noise float, tetap peka terhadap perubahan harga/indikator
+        return format(value, ".10g")
+    return str(value)
+
+def _connect(path=WRITE_CACHE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    db = sqlite3.connect(path)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS content_hashes (
+            tbl TEXT NOT NULL, ticker TEXT NOT NULL, key_date TEXT NOT NULL, hash INTEGER NOT NULL,
+            stored_at INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tbl, ticker, key_date)
+        ) WITHOUT ROWID
+    """)
+    # Store dari versi sebelum TTL: hash lamanya (stored_at 0) langsung kedaluwarsa dan dikirim ulang sekali
+    columns = {row[1] for row in db.execute("PRAGMA table_info(content_hashes)")}
+    if "stored_at" not in columns:
+        db.execute("ALTER TABLE content_hashes ADD COLUMN stored_at INTEGER NOT NULL DEFAULT 0")
+    return db
+
+def clear_hashes(db, namespaces=None, tickers=None):
+    """
+    Hapus hash dari store. namespaces: nama tabel/namespace; "technical_features" juga mencakup
+    "technical_features.<kolom>". None = semua. Mengembalikan jumlah hash yang dihapus.
+    """
+    where, params = [], []
+    if namespaces:
+        where.append("(" + " OR ".join("tbl = ? OR tbl LIKE ?" for _ in namespaces) + ")")
+        for ns in namespaces:
+            params += [ns, f"{ns}.%"]
+    if tickers:
+        where.append(f"ticker IN ({', '.join('?' for _ in tickers)})")
+        params += [t.upper() for t in tickers]
+    sql = "DELETE FROM content_hashes" + (" WHERE " + " AND ".join(where) if where else "")
+    deleted = db.execute(sql, params).rowcount
+    db.commit()
+    return deleted
+
+def row_hash(row, value_cols):
+    payload = "|".join(_canonical(row.get(col)) for col in value_cols).encode()
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "big", signed=True)
+
+class WriteSuppressor:
+    """
+    Lapisan penekan tulis: hanya baris yang BARU atau BERUBAH (hash konten berbeda) yang dikirim ke Supabase.
+
+    Alur pemakaian (setiap baris membawa kolom 'ticker'):
+        rows = suppressor.filter(rows)   # buang baris identik
+        ... upsert rows ...
+        suppressor.commit(rows)          # catat hash SETELAH upsert sukses
+
+    State lokal bisa dibangun ulang dari database dengan prime(ticker) (tarik massal satu kali).
+    Setiap writer lain ke tabel yang sama wajib commit() ke store ini agar hash tidak basi.
+    `namespace` memisahkan hash per kelompok kolom pada tabel yang sama (mis. satu per kolom indikator).
+    Hash lebih tua dari `ttl_days` dianggap tidak ada (lihat docstring modul untuk jalur pemulihan).
+    """
+
+    def __init__(self, table, date_col, value_cols, enabled=True, path=WRITE_CACHE_PATH, namespace=None,
+                 ttl_days=WRITE_CACHE_TTL_DAYS):
+        self.table = table
+        self.namespace = namespace or table
+        self.date_col = date_col
+        self.value_cols = list(value_cols)
+        self.enabled = enabled
+        self.ttl_days = ttl_days
+        self.sent = 0
+        self.suppressed = 0
+        self._known = OrderedDict()
+        self._db = _connect(path) if enabled else None
+
+    def known_hashes(self, ticker):
+        if ticker in self._known:
+            self._known.move_to_end(ticker)
+            return self._known[ticker]
+
+        # Batas TTL dihitung saat hash ticker dimuat: cukup untuk worker harian yang berjalan beberapa jam
+        cutoff = time.time() - self.ttl_days * 86400 if self.ttl_days else 0
+        cur = self._db.execute(
+            "SELECT key_date, hash FROM content_hashes WHERE tbl = ? AND ticker = ? AND stored_at >= ?",
+            (self.namespace, ticker, cutoff))
+        self._known[ticker] = dict(cur.fetchall())
+        if len(self._known) > KNOWN_TICKERS_IN_MEMORY:
+            self._known.popitem(last=False)
+        return self._known[ticker]
+
+    def prime(self, ticker):
+        """
+        Bangun ulang hash ticker dari isi database saat ini (mesin baru, atau setelah baris diubah dari luar).
+        Hash lokal lama ticker ini dibuang lebih dulu.
+        """
+        if not self.enabled:
+            return
+        columns = ", ".join([self.date_col] + self.value_cols)
+        rows = fetch_all_rows(lambda: supabase.table(self.table).select(columns)
+                              .eq("ticker", ticker).order(self.date_col))
+        self.invalidate([ticker])
+        self._store(ticker, rows)
+
+    def invalidate(self, tickers=None):
+        """Buang hash lokal namespace ini (seluruhnya, atau hanya ticker tertentu): baris terkait dikirim ulang."""
+        if not self.enabled:
+            return
+        clear_hashes(self._db, [self.namespace], tickers)
+        if tickers is None:
+            self._known.clear()
+        for ticker in tickers or ():
+            self._known.pop(ticker, None)
+
+    def filter(self, rows):
+        if not self.enabled:
+            self.sent += len(rows)
+            return rows
+
+        changed = [r for r in rows
+                   if self.known_hashes(r['ticker']).get(str(r[self.date_col])) != row_hash(r, self.value_cols)]
+        self.sent += len(changed)
+        self.suppressed += len(rows) - len(changed)
+        return changed
+
+    def commit(self, rows):
+        if self.enabled and rows:
+            self._store(None, rows)
+
+    def _store(self, ticker, rows):
+        stored_at = int(time.time())
+        entries = []
+        for r in rows:
+            row_ticker = ticker or r['ticker']
+            key = str(r[self.date_col])
+            h = row_hash(r, self.value_cols)
+            self.known_hashes(row_ticker)[key] = h
+            entries.append((self.namespace, row_ticker, key, h, stored_at))
+        self._db.executemany("INSERT OR REPLACE INTO content_hashes (tbl, ticker, key_date, hash, stored_at) "
+                             "VALUES (?, ?, ?, ?, ?)", entries)
+        self._db.commit()
+
+    def summary(self):
+        total = self.sent + self.suppressed
+        pct = (self.suppressed / total * 100) if total else 0
+        return f"[{self.namespace}] dikirim {self.sent} baris | ditekan {self.suppressed} baris ({pct:.1f}%)"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kelola cache hash lokal penekan tulis")
+    parser.add_argument("--clear", action="store_true", help="Hapus hash (baris terkait dikirim ulang pada run berikutnya)")
+    parser.add_argument("--namespace", nargs="+", help="Batasi ke tabel/namespace, mis. daily_market_prices technical_features")
+    parser.add_argument("--tickers", nargs="+", help="Batasi ke ticker tertentu")
+    args = parser.parse_args()
+
+    db = _connect()
+    if args.clear:
+        deleted = clear_hashes(db, args.namespace, args.tickers)
+        print(f"🧹 {deleted} hash dihapus dari {WRITE_CACHE_PATH}.")
+    else:
+        for tbl, n in db.execute("SELECT tbl, COUNT(*) FROM content_hashes GROUP BY tbl ORDER BY tbl"):
+            print(f"🧊 {tbl}: {n} hash")